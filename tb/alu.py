@@ -1,32 +1,37 @@
 import cocotb
 from cocotb.triggers import Timer
-import random
+import numpy as np
 
+from stimulus import random_test
 from utils import bin_to_hex
+from vectors import alu_model, check, drive, random_words
+
+VECTORS = 200_000
 
 # Test that an unknown instruction reverts to default
-@cocotb.test()
-async def default_test(dut):
+@random_test(1)
+async def default_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b1111
-    src1 = random.randint(0, 0xFFFFFFFF)
-    src2 = random.randint(0, 0xFFFFFFFF)
-    dut.src1.value = src1
-    dut.src2.value = src2
-    expected = 0
-    # Await 1 ns for the infos to propagate
-    await Timer(1, units="ns")
-    assert int(dut.alu_result.value) == expected
+    for rng in stimulus:
+        src1 = rng.randint(0, 0xFFFFFFFF)
+        src2 = rng.randint(0, 0xFFFFFFFF)
+        dut.src1.value = src1
+        dut.src2.value = src2
+        expected = 0
+        # Await 1 ns for the infos to propagate
+        await Timer(1, units="ns")
+        assert int(dut.alu_result.value) == expected
 
 
 
-@cocotb.test()
-async def add_test(dut):
+@random_test(1000)
+async def add_test(dut, stimulus):
     await Timer(1, units = "ns")
     dut.alu_control.value = 0b0000
-    for _ in range(1000):
-        src1 = random.randint(0, 0xFFFFFFFF)
-        src2 = random.randint(0, 0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0, 0xFFFFFFFF)
+        src2 = rng.randint(0, 0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
 
@@ -36,13 +41,13 @@ async def add_test(dut):
         await Timer(1, units="ns")
         assert int(dut.alu_result.value) == expected
 
-@cocotb.test()
-async def and_test(dut):
+@random_test(1000)
+async def and_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0010
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
         expected = src1 & src2
@@ -50,13 +55,13 @@ async def and_test(dut):
         await Timer(1, units="ns")
         assert int(dut.alu_result.value) == expected
 
-@cocotb.test()
-async def or_test(dut):
+@random_test(1000)
+async def or_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0011
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
         expected = src1 | src2
@@ -77,13 +82,13 @@ async def zero_test(dut):
     assert int(dut.alu_result.value) == 0
 
 
-@cocotb.test()
-async def sub_test(dut):
+@random_test(1000)
+async def sub_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0001
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
 
         dut.src1.value = src1
         dut.src2.value = src2
@@ -95,13 +100,13 @@ async def sub_test(dut):
         assert bin_to_hex(dut.alu_result.value) == hex(expected)[2:].zfill(8).upper()
         assert int(str(dut.alu_result.value),2) == expected
 
-@cocotb.test()
-async def slt_test(dut):
+@random_test(1000)
+async def slt_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0101
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
 
@@ -123,13 +128,13 @@ async def slt_test(dut):
         assert int(dut.alu_result.value) == expected
         assert dut.alu_result.value == 31*"0" + str(int(dut.alu_result.value))
 
-@cocotb.test()
-async def sltu_test(dut):
+@random_test(1000)
+async def sltu_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0111
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
 
@@ -138,13 +143,13 @@ async def sltu_test(dut):
 
         assert dut.alu_result.value == 31*"0" + str(int(dut.alu_result.value))
 
-@cocotb.test()
-async def xor_test(dut):
+@random_test(1000)
+async def xor_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b1000 #xor
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
 
@@ -153,13 +158,13 @@ async def xor_test(dut):
 
         assert int(dut.alu_result.value) ==  int(expected)
 
-@cocotb.test()
-async def sll_test(dut):
+@random_test(1000)
+async def sll_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0100 #sll
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         shamt = src2 & 0b11111
         dut.src2.value = shamt
@@ -169,13 +174,13 @@ async def sll_test(dut):
 
         assert int(dut.alu_result.value) ==  int(expected)
 
-@cocotb.test()
-async def srl_test(dut):
+@random_test(1000)
+async def srl_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0110 #srl
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         # pyhton only perfomrs sra
         # but here, pyhton interprets number as non-signed by default, meaning the right shift will
         # unconditionally fill upper bits with 0s and we can pass the test like this :
@@ -188,17 +193,17 @@ async def srl_test(dut):
 
         assert int(dut.alu_result.value) ==  int(expected)
 
-@cocotb.test()
-async def sra_test(dut):
+@random_test(1000)
+async def sra_test(dut, stimulus):
     await Timer(1, units="ns")
     dut.alu_control.value = 0b1001 #sra
-    for _ in range(1000):
+    for rng in stimulus:
         # pyhton only perfomrs sra
         # We have to hint python of the sign so we disociate signed and unsigned
 
         # UNSIGNED TESTS
-        src1 = random.randint(0,0x7FFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF) #shamt can be whatever
+        src1 = rng.randint(0,0x7FFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF) #shamt can be whatever
         dut.src1.value = src1
         shamt = src2 & 0b11111
         dut.src2.value = shamt
@@ -209,8 +214,8 @@ async def sra_test(dut):
         assert int(dut.alu_result.value) ==  int(expected)
 
         # SIGNED TESTS
-        src1 = random.randint(0x80000000,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF) #shamt can be whatever
+        src1 = rng.randint(0x80000000,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF) #shamt can be whatever
         dut.src1.value = src1
         shamt = src2 & 0b11111
         dut.src2.value = shamt
@@ -234,14 +239,14 @@ async def zero_test(dut):
     assert int(dut.zero.value) == 1
     assert int(dut.alu_result.value) == 0
 
-@cocotb.test()
-async def last_bit_test(dut):
+@random_test(1000)
+async def last_bit_test(dut, stimulus):
     # (logic copy-pasted from slt_test function)
     await Timer(1, units="ns")
     dut.alu_control.value = 0b0101
-    for _ in range(1000):
-        src1 = random.randint(0,0xFFFFFFFF)
-        src2 = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        src1 = rng.randint(0,0xFFFFFFFF)
+        src2 = rng.randint(0,0xFFFFFFFF)
         dut.src1.value = src1
         dut.src2.value = src2
 
@@ -257,3 +262,22 @@ async def last_bit_test(dut):
             expected = int((src1 - (1<<32)) < (src2 - (1<<32)))
             
         assert dut.last_bit.value == str(expected)
+
+@cocotb.test()
+async def alu_vector_test(dut):
+    # Every operation, undefined controls included, on random operands
+    rng = np.random.default_rng(0)
+    inputs = {
+        "alu_control": random_words(rng, VECTORS, 4),
+        "src1": random_words(rng, VECTORS),
+        "src2": random_words(rng, VECTORS),
+    }
+    # Some close operands, so that sub/slt/sltu and zero also see equal values
+    small = rng.random(VECTORS) < 0.1
+    inputs["src2"][small] = inputs["src1"][small] + random_words(rng, int(small.sum()), 2)
+
+    got = await drive(dut, inputs, ("alu_result", "zero", "last_bit"))
+    result, zero, last_bit = alu_model(*inputs.values())
+    check("alu_result", got["alu_result"], result, inputs)
+    check("zero", got["zero"], zero, inputs)
+    check("last_bit", got["last_bit"], last_bit, inputs)
@@ -0,0 +1,108 @@
+# BACKDOOR ACCESS TO THE REGFILE AND MEMORIES
+#
+# Resolves a memory array handle once and then moves whole memories (or any
+# range of them) in a single array read or write. Snapshots are plain word
+# arrays, so two of them can be diffed to see what a piece of code changed.
+#
+# Byte addresses follow the core: word index (address - start_addr) >> 2,
+# byte 0 of a word in bits 7:0.
+
+from array import array
+
+from utils import load_words, to_int
+
+
+class MemoryBackdoor:
+    def __init__(self, mem, start_addr=0):
+        self.mem = mem
+        self.start_addr = start_addr
+        self.depth = len(mem)
+        self._words = [None] * self.depth
+
+    def _word_handle(self, index):
+        handle = self._words[index]
+        if handle is None:
+            handle = self._words[index] = self.mem[index]
+        return handle
+
+    def index(self, address):
+        index = (address - self.start_addr) >> 2
+        if not 0 <= index < self.depth:
+            raise IndexError(f"Address 0x{address:08x} outside of memory at 0x{self.start_addr:08x}")
+        return index
+
+    # -- Reads --
+
+    def read(self):
+        # The whole memory as a word array, in one read
+        return array("I", [to_int(v) for v in self.mem.value])
+
+    snapshot = read
+
+    def read_word(self, index):
+        # Unlike read(), an unresolved word raises rather than reading as 0
+        return int(self._word_handle(index).value)
+
+    def read_words(self, address, count):
+        first = self.index(address)
+        if count > 64:
+            return self.read()[first:first + count]
+        return array("I", [to_int(self._word_handle(first + i).value) for i in range(count)])
+
+    def read_bytes(self, address, length):
+        first = address & ~3
+        words = self.read_words(first, (address + length - first + 3) >> 2)
+        return words.tobytes()[address - first:address - first + length]
+
+    # -- Writes --
+
+    def write_word(self, index, value):
+        self._word_handle(index).value = value & 0xFFFFFFFF
+
+    def write_words(self, address, words):
+        load_words(self.mem, words, self.index(address))
+
+    def write_bytes(self, address, data):
+        # Read-modify-write of the words covering [address, address + len(data))
+        first = address & ~3
+        count = (address + len(data) - first + 3) >> 2
+        words = self.read_words(first, count)
+        buffer = bytearray(words.tobytes())
+        buffer[address - first:address - first + len(data)] = data
+        words = array("I", bytes(buffer))
+        if count > 64:
+            self.write_words(first, words)
+        else:
+            index = self.index(first)
+            for i, word in enumerate(words):
+                self.write_word(index + i, word)
+
+
+def diff(before, after, start_addr=0):
+    # [(address, before, after)] for every word that differs between two snapshots
+    return [
+        (start_addr + 4 * i, old, new)
+        for i, (old, new) in enumerate(zip(before, after))
+        if old != new
+    ]
+
+
+def format_diff(changes):
+    return "\n".join(f"  0x{address:08x}: 0x{old:08x} -> 0x{new:08x}" for address, old, new in changes)
+
+
+_backdoors = {}
+
+
+def backdoor(mem, start_addr=0):
+    # MemoryBackdoor for a memory array handle, created on first use
+    key = (id(mem), start_addr)
+    door = _backdoors.get(key)
+    if door is None or door.mem is not mem:
+        door = _backdoors[key] = MemoryBackdoor(mem, start_addr)
+    return door
+
+
+def regfile(cpu):
+    # Backdoor to the 32 registers of a Cpu, indexed by register number
+    return backdoor(cpu.regfile.mem.mem)
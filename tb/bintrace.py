@@ -0,0 +1,251 @@
+# BINARY EXECUTION TRACES
+#
+# Full commit streams written as fixed-width little-endian records, one per
+# retired instruction:
+#
+#   pc  instruction  data  mem_addr  mem_wdata  rd  mem_be  (2 pad bytes)
+#
+# rd is 0 when nothing is written back, and the memory fields are 0 unless
+# the instruction stored something. Loads are recorded with the value that
+# reached the register file, so an RTL trace (TraceMonitor) and a reference
+# model trace (trace_model) of the same program are byte-identical.
+#
+# Traces are compared through mmap: block hashes find the first block that
+# differs, then the block is bisected down to a single record.
+#
+# Usage:
+#   python bintrace.py model <program> <out> [max_steps]
+#   python bintrace.py show <trace> [first] [count]
+#   python bintrace.py diff <trace_a> <trace_b>
+
+import hashlib
+import mmap
+import struct
+
+from utils import Writeback, to_int
+
+RECORD = struct.Struct("<IIIIIBB2x")
+RECORD_SIZE = RECORD.size
+# Records per hashed block when looking for a divergence
+HASH_BLOCK = 1 << 16
+
+
+class TraceWriter:
+    def __init__(self, path, buffer_records=4096):
+        self._file = open(path, "wb")
+        self._buffer = bytearray(RECORD_SIZE * buffer_records)
+        self._offset = 0
+        self.count = 0
+
+    def append(self, pc, instruction, rd=0, data=0, mem_addr=0, mem_be=0, mem_wdata=0):
+        RECORD.pack_into(self._buffer, self._offset, pc, instruction, data, mem_addr, mem_wdata, rd, mem_be)
+        self._offset += RECORD_SIZE
+        self.count += 1
+        if self._offset == len(self._buffer):
+            self.flush()
+
+    def append_commit(self, commit):
+        # Record an iss.Commit
+        rd = commit.rd or 0
+        if commit.mem_wdata is not None and commit.mem_be:
+            self.append(commit.pc, commit.instruction, rd, commit.value if rd else 0,
+                        commit.mem_addr, commit.mem_be, commit.mem_wdata)
+        else:
+            self.append(commit.pc, commit.instruction, rd, commit.value if rd else 0)
+
+    def flush(self):
+        self._file.write(memoryview(self._buffer)[:self._offset])
+        self._offset = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            size = f.seek(0, 2)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        try:
+            if size % RECORD_SIZE:
+                raise ValueError(f"{path}: {size} bytes is not a whole number of {RECORD_SIZE} byte records")
+            self.buffer = memoryview(self._mmap) if size else memoryview(b"")
+        except BaseException:
+            if self._mmap is not None:
+                self._mmap.close()
+            raise
+        self.count = size // RECORD_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        # (pc, instruction, data, mem_addr, mem_wdata, rd, mem_be)
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self.buffer, index * RECORD_SIZE)
+
+    def block(self, first, last):
+        # Raw bytes of records [first, last)
+        return self.buffer[first * RECORD_SIZE:last * RECORD_SIZE]
+
+    def close(self):
+        self.buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def first_divergence(a, b, block=HASH_BLOCK):
+    # Index of the first record that differs between two TraceReaders, or
+    # None if they are identical. When one trace is a prefix of the other,
+    # the divergence is at the end of the shorter one.
+    common = min(a.count, b.count)
+    for first in range(0, common, block):
+        last = min(first + block, common)
+        if _digest(a.block(first, last)) != _digest(b.block(first, last)):
+            break
+    else:
+        return None if a.count == b.count else common
+
+    # Bisect the differing block
+    while last - first > 1:
+        middle = (first + last) // 2
+        if a.block(first, middle) == b.block(first, middle):
+            first = middle
+        else:
+            last = middle
+    return first
+
+
+def format_record(record):
+    from disasm import disassemble
+
+    pc, instruction, data, mem_addr, mem_wdata, rd, mem_be = record
+    line = f"{pc:08x}  {instruction:08x}  {disassemble(instruction, pc):<26}"
+    if rd:
+        line += f" x{rd} <= 0x{data:08x}"
+    if mem_be:
+        line += f" mem[0x{mem_addr:08x}] <= 0x{mem_wdata:08x} (be 0b{mem_be:04b})"
+    return line.rstrip()
+
+
+class TraceMonitor:
+    # Writes every commit of a Cpu to a TraceWriter. A load's value reaches
+    # reg_write_port one cycle after the load, so its record is held back
+    # for a cycle. Only needs cocotb once run, the rest of this module
+    # also serves the offline tools.
+    def __init__(self, cpu, writer):
+        self.writer = writer
+        self._clk = cpu.clk
+        self._pc = cpu.pc
+        self._instruction = cpu.instruction
+        self._next_writeback = cpu.next_writeback
+        self._wb_data = cpu.reg_write_port.data
+        self._dmem_addr = cpu.dmem_addr
+        self._dmem_be = cpu.dmem_byte_write_enable
+        self._dmem_write_data = cpu.dmem_write_data
+        self._pending = None
+
+    def sample(self):
+        writer = self.writer
+        self.finish()
+
+        pc = to_int(self._pc.value)
+        instruction = to_int(self._instruction.value)
+        wb = Writeback(to_int(self._next_writeback.value))
+        rd = wb.dest_reg if wb.reg_write else 0
+        if wb.is_mem_read:
+            # Misaligned loads are dropped with an empty byte enable mask
+            if rd and wb.byte_enable_mask:
+                self._pending = (pc, instruction, rd)
+                return
+            rd = 0
+
+        be = to_int(self._dmem_be.value)
+        if be:
+            writer.append(pc, instruction, rd, wb.data if rd else 0,
+                          to_int(self._dmem_addr.value), be, to_int(self._dmem_write_data.value))
+        else:
+            writer.append(pc, instruction, rd, wb.data if rd else 0)
+
+    async def run(self, max_cycles=None):
+        from cocotb.triggers import RisingEdge
+
+        clk = self._clk
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            self.sample()
+            cycles += 1
+            await RisingEdge(clk)
+        self.finish()
+
+    def finish(self):
+        # Write out a load still waiting for its data
+        if self._pending is not None:
+            pc, instruction, rd = self._pending
+            self.writer.append(pc, instruction, rd, to_int(self._wb_data.value))
+            self._pending = None
+
+
+def trace_model(model, writer, max_steps):
+    # Run an iss.Iss for up to `max_steps` instructions, stopping at `j .`
+    for _ in range(max_steps):
+        commit = model.step()
+        writer.append_commit(commit)
+        if model.pc == commit.pc:
+            break
+    return writer.count
+
+
+if __name__ == "__main__":
+    import sys
+
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "model":
+        from iss import Iss
+        from loader import load_program
+
+        model = Iss.from_images(load_program(args[0]))
+        max_steps = int(args[2]) if len(args) > 2 else 10_000_000
+        with TraceWriter(args[1]) as writer:
+            count = trace_model(model, writer, max_steps)
+        print(f"{count} records written to {args[1]}")
+    elif command == "show":
+        with TraceReader(args[0]) as trace:
+            first = int(args[1]) if len(args) > 1 else 0
+            count = int(args[2]) if len(args) > 2 else trace.count - first
+            for index in range(first, min(first + count, trace.count)):
+                print(f"{index:>10}  {format_record(trace[index])}")
+    elif command == "diff":
+        with TraceReader(args[0]) as a, TraceReader(args[1]) as b:
+            index = first_divergence(a, b)
+            if index is None:
+                print(f"Traces are identical ({a.count} records)")
+                sys.exit(0)
+            print(f"First divergence at record {index}")
+            for name, trace in ((args[0], a), (args[1], b)):
+                print(f"{name}:")
+                for i in range(max(0, index - 4), min(index + 1, trace.count)):
+                    print(f"  {i:>10}  {format_record(trace[i])}")
+                if index >= trace.count:
+                    print("  (end of trace)")
+            sys.exit(1)
+    else:
+        sys.exit(f"Unknown command {command}")
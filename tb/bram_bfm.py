@@ -0,0 +1,150 @@
+# BRAMPORT BUS-FUNCTIONAL MODEL
+#
+# memutils::BramPort master and monitor, for bus-level tests of the
+# peripherals and memories:
+# - BramMaster issues one queued transaction per clock and completes each
+#   one with the read data returned on the next cycle, i.e. as seen right
+#   after the edge that sampled the transaction. read()/write() return
+#   the transaction, which can be awaited for its read data, so a test can
+#   queue a whole burst and check the results afterwards
+# - BramMonitor records every enabled transaction seen on a port, with its
+#   read data
+#
+#   master = BramMaster(dut.bus, dut.clk).start()
+#   master.write(0x0, 0xAA, 0b0001)
+#   data = await master.read(0x0)
+#
+# Both only wake up on clock edges while the bus is busy.
+
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import Event, RisingEdge
+
+from utils import to_int
+
+
+class BramTransaction:
+    __slots__ = ("address", "byte_enable", "write_data", "read_data", "_done")
+
+    def __init__(self, address, byte_enable=0, write_data=0):
+        self.address = address
+        self.byte_enable = byte_enable
+        self.write_data = write_data
+        self.read_data = None
+        self._done = Event()
+
+    @property
+    def is_write(self):
+        return self.byte_enable != 0
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _complete(self, read_data):
+        self.read_data = read_data
+        self._done.set()
+
+    async def wait(self):
+        # Read data once the transaction has completed
+        if not self._done.is_set():
+            await self._done.wait()
+        return self.read_data
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def __repr__(self):
+        read_data = "-" if self.read_data is None else f"0x{self.read_data:08x}"
+        return f"BramTransaction(address=0x{self.address:08x}, be=0b{self.byte_enable:04b}, write_data=0x{self.write_data:08x}, read_data={read_data})"
+
+
+class BramMaster:
+    def __init__(self, port, clk):
+        self.port = port
+        self.clk = clk
+        self._queue = Queue()
+        self._idle = Event()
+        self._idle.set()
+
+    def start(self):
+        self._drive_idle()
+        cocotb.start_soon(self._run())
+        return self
+
+    def _drive_idle(self):
+        port = self.port
+        port.enable.value = 0
+        port.address.value = 0
+        port.byte_write_enable.value = 0
+        port.write_data.value = 0
+
+    def issue(self, transaction):
+        self._idle.clear()
+        self._queue.put_nowait(transaction)
+        return transaction
+
+    def read(self, address):
+        return self.issue(BramTransaction(address))
+
+    def write(self, address, data, byte_enable=0b1111):
+        return self.issue(BramTransaction(address, byte_enable, data))
+
+    async def wait_idle(self):
+        # Until every issued transaction has completed
+        await self._idle.wait()
+
+    async def _run(self):
+        port = self.port
+        clk = self.clk
+        queue = self._queue
+        while True:
+            if queue.empty():
+                # Nothing to do until the next transaction
+                self._drive_idle()
+                self._idle.set()
+                transaction = await queue.get()
+            else:
+                transaction = queue.get_nowait()
+
+            port.enable.value = 1
+            port.address.value = transaction.address
+            port.byte_write_enable.value = transaction.byte_enable
+            port.write_data.value = transaction.write_data
+
+            await RisingEdge(clk)
+            # Our writes only land after this point, so the port still shows
+            # the sampled transaction, with its response on read_data
+            transaction._complete(to_int(port.read_data.value))
+
+
+class BramMonitor:
+    def __init__(self, port, clk, callback=None):
+        self.port = port
+        self.clk = clk
+        self.callback = callback
+        self.transactions = Queue()
+
+    def start(self):
+        cocotb.start_soon(self._run())
+        return self
+
+    async def _run(self):
+        port = self.port
+        clk = self.clk
+        while True:
+            if not to_int(port.enable.value):
+                await RisingEdge(port.enable)
+            await RisingEdge(clk)
+
+            # Inputs as sampled by this edge, and the response
+            if to_int(port.enable.value):
+                transaction = BramTransaction(
+                    to_int(port.address.value),
+                    to_int(port.byte_write_enable.value),
+                    to_int(port.write_data.value),
+                )
+                transaction._complete(to_int(port.read_data.value))
+                self.transactions.put_nowait(transaction)
+                if self.callback is not None:
+                    self.callback(transaction)
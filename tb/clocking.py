@@ -0,0 +1,90 @@
+# CLOCK GENERATION
+#
+# The test tops generate their clock in the simulator (a `clock_gen`
+# instance of sim_clock, src/tests/common/sim_clock.veryl), so Python isn't
+# woken up on every edge. start_clock() then only checks its period and
+# keeps track of its phase. For tops without one, it falls back on cocotb
+# 1.x's Clock, a Python coroutine toggling the signal from a Timer every
+# half period.
+#
+# Either way, SimClock.cycles(n) waits for the n-th next rising edge with
+# one Timer and one RisingEdge, instead of waking the test on every edge
+# like a loop of `await RisingEdge(clk)` (or cocotb's ClockCycles) does.
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, Timer
+from cocotb.utils import get_sim_steps, get_sim_time, get_time_from_sim_steps
+
+import telemetry
+
+
+def hdl_clock(signal):
+    # The clock_gen instance of the test top driving `signal`, or None
+    top = cocotb.top
+    if signal._path != f"{top._path}.clk":
+        return None
+    try:
+        return top.clock_gen
+    except AttributeError:
+        return None
+
+
+class SimClock:
+    def __init__(self, signal, period=1, units="ns"):
+        self.signal = signal
+        self.period = get_sim_steps(period, units)
+        if self.period % 2:
+            raise ValueError(f"Clock period of {self.period} simulator steps can't be split in two halves")
+
+        self._generator = hdl_clock(signal)
+        if self._generator is not None:
+            generated = get_sim_steps(int(self._generator.period_ps.value), "ps")
+            if generated != self.period:
+                raise ValueError(f"{signal._path} is generated with a period of {generated} simulator steps, "
+                                 f"not {self.period}")
+            self._clock = None
+        else:
+            self._clock = Clock(signal, period, units=units)
+        self._task = None
+        # Rising edges are at start_time + k * period
+        self.start_time = None
+
+    def start(self):
+        telemetry.clock_started(get_time_from_sim_steps(self.period, "ns"))
+        if self._clock is None:
+            # Already running since time 0
+            self.start_time = 0
+            return self
+        self.start_time = get_sim_time("step")
+        self._task = cocotb.start_soon(self._clock.start(start_high=True))
+        return self
+
+    def stop(self):
+        # Generated clocks can't be stopped
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def cycles(self, n):
+        # Wait for n rising edges, like ClockCycles(signal, n)
+        signal = self.signal
+        if n <= 2:
+            for _ in range(n):
+                await RisingEdge(signal)
+            return
+
+        period = self.period
+        now = get_sim_time("step")
+        # Next rising edge strictly after now, then n - 1 more
+        next_edge = self.start_time + ((now - self.start_time) // period + 1) * period
+        target = next_edge + (n - 1) * period
+        # Sleep until the falling edge before the target, then catch it
+        await Timer(target - now - period // 2, "step")
+        await RisingEdge(signal)
+
+
+def start_clock(signal, period=1, units="ns"):
+    # Start a clock on `signal`, or check the one the top generates.
+    # Returns the SimClock.
+    return SimClock(signal, period, units).start()
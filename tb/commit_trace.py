@@ -0,0 +1,107 @@
+# COMMIT TRACE RING BUFFER
+#
+# Keeps the last N commits (PC, instruction, packed Writeback, data memory
+# access) in preallocated arrays, and prints them with disassembly when a
+# test fails. Recording a commit only overwrites array slots.
+
+import contextlib
+from array import array
+
+from cocotb.triggers import RisingEdge
+
+from disasm import disassemble
+from utils import Writeback, to_int
+
+
+class CommitTrace:
+    def __init__(self, size=64):
+        self.size = size
+        self.count = 0
+        self._cycle = array("Q", bytes(8 * size))
+        self._pc = array("I", bytes(4 * size))
+        self._instruction = array("I", bytes(4 * size))
+        self._writeback = array("Q", bytes(8 * size))
+        self._mem_addr = array("I", bytes(4 * size))
+        self._mem_be = array("B", bytes(size))
+        self._mem_wdata = array("I", bytes(4 * size))
+
+    def record(self, cycle, pc, instruction, writeback, mem_addr=0, mem_be=0, mem_wdata=0):
+        i = self.count % self.size
+        self._cycle[i] = cycle
+        self._pc[i] = pc
+        self._instruction[i] = instruction
+        self._writeback[i] = writeback
+        self._mem_addr[i] = mem_addr
+        self._mem_be[i] = mem_be
+        self._mem_wdata[i] = mem_wdata
+        self.count += 1
+
+    def entries(self):
+        # Yields the recorded commits, oldest first
+        first = max(0, self.count - self.size)
+        for n in range(first, self.count):
+            i = n % self.size
+            yield (
+                self._cycle[i], self._pc[i], self._instruction[i], self._writeback[i],
+                self._mem_addr[i], self._mem_be[i], self._mem_wdata[i],
+            )
+
+    def format(self):
+        lines = [f"Last {min(self.count, self.size)} of {self.count} commits (oldest first):"]
+        for cycle, pc, instruction, packed, mem_addr, mem_be, mem_wdata in self.entries():
+            line = f"  {cycle:>8}  {pc:08x}  {instruction:08x}  {disassemble(instruction, pc):<26}"
+            wb = Writeback(packed)
+            if wb.reg_write and wb.dest_reg:
+                if wb.is_mem_read:
+                    line += f" x{wb.dest_reg} <= mem (be 0b{wb.byte_enable_mask:04b})"
+                else:
+                    line += f" x{wb.dest_reg} <= 0x{wb.data:08x}"
+            if mem_be:
+                line += f" mem[0x{mem_addr:08x}] <= 0x{mem_wdata:08x} (be 0b{mem_be:04b})"
+            lines.append(line.rstrip())
+        return "\n".join(lines)
+
+    def dump(self):
+        print(self.format())
+
+    @contextlib.contextmanager
+    def dump_on_failure(self):
+        # with trace.dump_on_failure(): ... prints the trace if the body raises
+        try:
+            yield self
+        except BaseException:
+            self.dump()
+            raise
+
+
+class CommitMonitor:
+    # Records every commit of a Cpu into a CommitTrace, for tests that don't
+    # already go through the lockstep checker
+    def __init__(self, cpu, trace):
+        self.trace = trace
+        self._clk = cpu.clk
+        self._pc = cpu.pc
+        self._instruction = cpu.instruction
+        self._next_writeback = cpu.next_writeback
+        self._dmem_addr = cpu.dmem_addr
+        self._dmem_be = cpu.dmem_byte_write_enable
+        self._dmem_write_data = cpu.dmem_write_data
+
+    def sample(self, cycle):
+        be = to_int(self._dmem_be.value)
+        self.trace.record(
+            cycle,
+            to_int(self._pc.value),
+            to_int(self._instruction.value),
+            to_int(self._next_writeback.value),
+            to_int(self._dmem_addr.value) if be else 0,
+            be,
+            to_int(self._dmem_write_data.value) if be else 0,
+        )
+
+    async def run(self):
+        cycle = 0
+        while True:
+            self.sample(cycle)
+            cycle += 1
+            await RisingEdge(self._clk)
@@ -0,0 +1,135 @@
+# LOCKSTEP CO-SIMULATION CHECKER
+#
+# Steps a reference model (see iss.Iss) alongside the CPU and compares
+# every commit. Each clock it samples cpu.pc, cpu.instruction and the
+# packed next_writeback struct. Loads are completed on the following
+# cycle by reading reg_write_port.data, and stores by reading the data
+# memory port, so only those instructions cost extra reads.
+#
+# Given a commit_trace.CommitTrace, every checked commit is also recorded in
+# it, so a failing test can dump the instructions leading up to the failure.
+
+from cocotb.triggers import RisingEdge
+
+from iss import OP_I_TYPE_LOAD, OP_S_TYPE
+from utils import Writeback, to_int
+
+
+class LockstepMismatch(AssertionError):
+    pass
+
+
+class LockstepChecker:
+    def __init__(self, cpu, model, check_stores=True, trace=None):
+        self.cpu = cpu
+        self.model = model
+        self.check_stores = check_stores
+        self.trace = trace
+
+        # Resolve the handles once
+        self._clk = cpu.clk
+        self._pc = cpu.pc
+        self._instruction = cpu.instruction
+        self._next_writeback = cpu.next_writeback
+        self._wb_data = cpu.reg_write_port.data
+        self._dmem_addr = cpu.dmem_addr
+        self._dmem_be = cpu.dmem_byte_write_enable
+        self._dmem_write_data = cpu.dmem_write_data
+
+        self.cycles = 0
+        # Commit of a load whose data reaches the regfile this cycle
+        self._pending_load = None
+
+    async def run(self, max_cycles, until_pc=None):
+        # Check one commit per clock, starting with the instruction that
+        # is currently being executed. Stops after `max_cycles`, when the
+        # model reaches `until_pc`, or when it jumps to itself (`j .`).
+        # Returns the number of instructions checked.
+        clk = self._clk
+        for _ in range(max_cycles):
+            commit = self.check_cycle()
+            # Also lets the writeback of the last instruction land
+            await RisingEdge(clk)
+            if self.model.pc == commit.pc or self.model.pc == until_pc:
+                break
+
+        self._check_pending_load()
+        return self.cycles
+
+    def check_cycle(self):
+        self._check_pending_load()
+
+        pc = to_int(self._pc.value)
+        instruction = to_int(self._instruction.value)
+        packed = to_int(self._next_writeback.value)
+
+        model = self.model
+        if pc != model.pc:
+            self._fail(f"PC mismatch: RTL 0x{pc:08x}, model 0x{model.pc:08x}")
+
+        op = instruction & 0x7F
+        mem_addr = mem_be = mem_wdata = 0
+        if op == OP_S_TYPE and (self.check_stores or self.trace is not None):
+            mem_be = to_int(self._dmem_be.value)
+            if mem_be:
+                mem_addr = to_int(self._dmem_addr.value)
+                mem_wdata = to_int(self._dmem_write_data.value)
+        if self.trace is not None:
+            self.trace.record(self.cycles, pc, instruction, packed, mem_addr, mem_be, mem_wdata)
+
+        commit = model.step()
+        self.cycles += 1
+
+        if instruction != commit.instruction:
+            self._fail(f"Instruction mismatch at 0x{pc:08x}: RTL 0x{instruction:08x}, model 0x{commit.instruction:08x}")
+
+        wb = Writeback(packed)
+
+        if commit.rd is not None:
+            if not wb.reg_write or wb.dest_reg != commit.rd:
+                self._fail(f"Expected a write to x{commit.rd}, got {wb}", commit)
+            if op == OP_I_TYPE_LOAD:
+                if not wb.is_mem_read:
+                    self._fail(f"Load not flagged as a memory read: {wb}", commit)
+                self._pending_load = commit
+            elif wb.is_mem_read or wb.data != commit.value:
+                self._fail(f"Expected x{commit.rd} <= 0x{commit.value:08x}, got {wb}", commit)
+        elif (instruction >> 7) & 0x1F:
+            # Nothing written back. Dropped loads still flag reg_write
+            # but carry an empty byte enable mask.
+            if op == OP_I_TYPE_LOAD:
+                if wb.byte_enable_mask != 0:
+                    self._fail(f"Dropped load has byte enable mask 0b{wb.byte_enable_mask:04b}", commit)
+            elif wb.reg_write:
+                self._fail(f"Unexpected register write: {wb}", commit)
+
+        if self.check_stores and op == OP_S_TYPE:
+            self._check_store(commit, mem_addr, mem_be, mem_wdata)
+
+        return commit
+
+    def _check_pending_load(self):
+        commit = self._pending_load
+        if commit is None:
+            return
+        self._pending_load = None
+        data = to_int(self._wb_data.value)
+        if data != commit.value:
+            self._fail(f"Expected x{commit.rd} <= 0x{commit.value:08x} from memory, got 0x{data:08x}", commit)
+
+    def _check_store(self, commit, address, be, data):
+        if be != commit.mem_be:
+            self._fail(f"Store byte enable: RTL 0b{be:04b}, model 0b{commit.mem_be:04b}", commit)
+        if be == 0:
+            return
+        if address != commit.mem_addr or data != commit.mem_wdata:
+            self._fail(
+                f"Store: RTL 0x{data:08x} @ 0x{address:08x}, model 0x{commit.mem_wdata:08x} @ 0x{commit.mem_addr:08x}",
+                commit,
+            )
+
+    def _fail(self, message, commit=None):
+        context = f" (cycle {self.cycles}"
+        if commit is not None:
+            context += f", model: {commit}"
+        raise LockstepMismatch(message + context + ")")
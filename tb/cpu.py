@@ -1,39 +1,46 @@
 
 import cocotb
-from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 
-from utils import bin_to_hex, init_memory
-
-class Writeback:
-    def __init__(self, packed):
-        self.data = packed & 0xFFFFFFFF
-        self.dest_reg = (packed >> 32) & 0b11111
-        self.byte_enable_mask = (packed >> 32+5) & 0b1111
-        self.f3 = (packed >> 32+9) & 0b111
-        self.reg_write = (packed >> (32+12)) & 1
-        self.is_mem_read = (packed >> (32+13)) & 1
-    
-    def __str__(self):
-        return f"Writeback: data: 0x{self.data:08x}, dest_reg: {self.dest_reg}, reg_write: {self.reg_write}, be_mask: 0b{self.byte_enable_mask:04b}, is_mem_read: {self.is_mem_read}"
-
-    def assert_wb(self, dest_reg, expected):
-        assert self.data == expected, f'Expected 0x{expected:08x}, got 0x{self.data:08x} at register {self.dest_reg}'
-        assert self.dest_reg == dest_reg, f'Expected destination register {dest_reg}, got {self.dest_reg}'
+from backdoor import backdoor, diff, format_diff, regfile
+from clocking import start_clock
+from commit_trace import CommitMonitor, CommitTrace
+from cosim import LockstepChecker
+from func_coverage import collect
+from halt import wait_for_halt
+from iss import Iss
+from mem_config import TEST_RAM_CONFIG
+from rvgen import SELF_JUMP, RandomProgram
+from typegen import rtl
+from utils import Writeback, bin_to_hex, init_memory, load_words, parse_hex
+from watch import wait_for_pc, wait_for_reg_change, wait_for_store
+
+# Number of random programs run by cpu_random_test
+RANDOM_PROGRAMS = 20
 
 def assert_wb(wb_val, dest_reg, expected):
     Writeback(wb_val.value).assert_wb(dest_reg, expected)
 
-def assert_reg_contents(dut, reg, expected):
-    reg_value = dut.regfile.mem.mem[reg].value
-    assert expected == reg_value, f'Expected {expected:8x} at register {reg}, got {bin_to_hex(reg_value)}'
+def assert_reg_contents(cpu, reg, expected):
+    reg_value = regfile(cpu).read_word(reg)
+    assert expected == reg_value, f'Expected {expected:8x} at register {reg}, got {reg_value:08x}'
 
 def assert_dmem(dmem, address, expected):
-    # Offset the address
     # mem is byte adressed but is made out of words in the eyes of the software
-    word_idx = int((address - 0x400) / 4)
-    mem_value = dmem.mem[word_idx].value
-    assert expected == mem_value, f'Expected {expected:8x} at address {address}, got {bin_to_hex(mem_value)}'
+    ram = backdoor(dmem.mem, TEST_RAM_CONFIG.start_addr)
+    mem_value = ram.read_word(ram.index(address))
+    assert expected == mem_value, f'Expected {expected:8x} at address {address}, got {mem_value:08x}'
+
+def assert_state(soc, model):
+    # Compare all registers and the whole RAM with the reference model,
+    # one bulk read each. x0 is skipped, see WritebackMux.
+    regs = regfile(soc.cpu).read()
+    changes = [f"  x{r}: model 0x{model.regs[r]:08x}, RTL 0x{regs[r]:08x}" for r in range(1, 32) if regs[r] != model.regs[r]]
+    assert not changes, "Registers differ from the model:\n" + "\n".join(changes)
+
+    ram = backdoor(soc.ram.mem, TEST_RAM_CONFIG.start_addr)
+    changes = diff(model.ram, ram.read(), TEST_RAM_CONFIG.start_addr)
+    assert not changes, "RAM differs from the model:\n" + format_diff(changes)
 
 @cocotb.coroutine
 async def cpu_reset(dut):
@@ -50,34 +57,32 @@ async def cpu_reset(dut):
 
 @cocotb.test()
 async def cpu_integration_test(dut):
-    cocotb.start_soon(Clock(dut.clk, 1, units="ns").start())
-
-    import os
-    print("Current directory contents:", os.listdir(".."))
-    print(f"Current dir: {os.getcwd()}")
+    clock = start_clock(dut.clk)
 
-    # Instruction memory is at 0x000-0x3FF
-    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
-        imem_contents = f.read()
-    
-   # Data memory is at 0x400-0x7FF 
-    with open("./test_dmem.hex", "r", encoding="UTF-8") as f:
-        dmem_contents = f.read()
-    
+    # Instruction memory (0x000-0x3FF) and data memory (0x400-0x7FF) are
+    # preloaded at elaboration time from TEST_ROM_CONFIG::INIT_FILE and
+    # TEST_RAM_CONFIG::INIT_FILE, so there is nothing to load from here.
     imem = dut.soc.rom
     dmem = dut.soc.ram
     cpu = dut.soc.cpu
-    
-    await RisingEdge(dut.clk)
 
-    # Just like in real HW, memory isn't reset to 0 when the system is reset.
-    await init_memory(imem.mem, imem_contents)
-    await init_memory(dmem.mem, dmem_contents)
+    await RisingEdge(dut.clk)
 
     # Reset CPU
     await cpu_reset(dut)
     print("cpu reset")
 
+    # Keep the last commits around, they get printed if a check below fails
+    trace = CommitTrace()
+    cocotb.start_soon(CommitMonitor(cpu, trace).run())
+    with trace.dump_on_failure():
+        await cpu_program_checks(dut, clock, imem, dmem, cpu)
+
+    print("All tests passed! 👍Very nice!👍")
+
+async def cpu_program_checks(dut, clock, imem, dmem, cpu):
+    # Steps through the test program, checking each instruction
+
     # Check that the instruction mem loaded correctly
     assert bin_to_hex(imem.mem[0].value) == "40802903"
 
@@ -913,8 +918,163 @@ async def cpu_integration_test(dut):
     await RisingEdge(cpu.clk)
     assert dut.led[3] == 1
 
-    await RisingEdge(cpu.clk)
-    await RisingEdge(cpu.clk)
-    await RisingEdge(cpu.clk)
+    await clock.cycles(3)
+
+@cocotb.test()
+async def cpu_lockstep_test(dut):
+    # Run the whole test program against the reference model
+    start_clock(dut.clk)
+
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        imem_words = parse_hex(f.read())
+    with open("./test_dmem.hex", "r", encoding="UTF-8") as f:
+        dmem_contents = f.read()
+
+    # The previous test wrote to data memory, put the initial image back
+    await init_memory(dut.soc.ram.mem, dmem_contents)
+    model = Iss(imem_words, parse_hex(dmem_contents))
+
+    await cpu_reset(dut)
+
+    coverage = collect(dut.soc.cpu, dut.soc.mem_controller, "cpu_lockstep")
+    trace = CommitTrace()
+    checker = LockstepChecker(dut.soc.cpu, model, trace=trace)
+    with trace.dump_on_failure():
+        checked = await checker.run(max_cycles=1000, until_pc=4 * len(imem_words))
+        print(f"{checked} instructions checked against the reference model")
 
-    print("All tests passed! 👍Very nice!👍")
\ No newline at end of file
+        assert int(dut.led.value) == model.periph.out & 0x7F
+        assert_state(dut.soc, model)
+
+    if coverage is not None:
+        coverage.save()
+
+@cocotb.test()
+async def cpu_random_test(dut):
+    # Random programs filling the whole ROM, checked against the reference model
+    start_clock(dut.clk)
+
+    rom = dut.soc.rom.mem
+    coverage = collect(dut.soc.cpu, dut.soc.mem_controller, "cpu_random")
+    trace = CommitTrace()
+    for seed in range(RANDOM_PROGRAMS):
+        generator = RandomProgram(seed)
+        program = generator.fill(len(rom))
+        data = generator.data()
+
+        load_words(rom, program)
+        load_words(dut.soc.ram.mem, data)
+        model = Iss(program, data)
+
+        await cpu_reset(dut)
+        checker = LockstepChecker(dut.soc.cpu, model, trace=trace)
+        with trace.dump_on_failure():
+            await checker.run(max_cycles=len(program))
+            assert program[model.pc // 4] == SELF_JUMP, f"Seed {seed} did not reach the end of the program"
+            assert_state(dut.soc, model)
+
+    if coverage is not None:
+        coverage.save()
+
+    # Put the test program back for whoever runs next
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        await init_memory(rom, f.read())
+
+@cocotb.test()
+async def cpu_watchpoint_test(dut):
+    # Breakpoint on the first store of the test program, then watch its
+    # address and the next register that changes
+    start_clock(dut.clk)
+
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        imem_words = parse_hex(f.read())
+    with open("./test_dmem.hex", "r", encoding="UTF-8") as f:
+        dmem_contents = f.read()
+    await init_memory(dut.soc.ram.mem, dmem_contents)
+
+    model = Iss(imem_words, parse_hex(dmem_contents))
+    commits = []
+    while model.pc < 4 * len(imem_words) and len(commits) < 1000:
+        commits.append(model.step())
+    store_index = next(i for i, c in enumerate(commits) if c.mem_wdata is not None and c.mem_be)
+    store = commits[store_index]
+
+    # Register writes land a cycle after their instruction, so the one
+    # before the store is still to come at the breakpoint
+    regs = [0] * 32
+    for commit in commits[:store_index - 1]:
+        if commit.rd is not None:
+            regs[commit.rd] = commit.value
+    change = next(c for c in commits[store_index - 1:] if c.rd is not None and c.value != regs[c.rd])
+
+    await cpu_reset(dut)
+    cpu = dut.soc.cpu
+
+    await wait_for_pc(cpu, store.pc)
+    assert int(cpu.instruction.value) == store.instruction
+
+    address, be, data = await wait_for_store(cpu, store.mem_addr)
+    assert (address, be, data) == (store.mem_addr, store.mem_be, store.mem_wdata)
+
+    value = await wait_for_reg_change(cpu, change.rd)
+    assert value == change.value, f"x{change.rd}: expected 0x{change.value:08x}, got 0x{value:08x}"
+
+@cocotb.test()
+async def cpu_reg_watch_test(dut):
+    # Follow the most changed register of the test program through its
+    # successive values, one watchpoint per change
+    start_clock(dut.clk)
+
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        imem_words = parse_hex(f.read())
+    with open("./test_dmem.hex", "r", encoding="UTF-8") as f:
+        dmem_contents = f.read()
+    await init_memory(dut.soc.ram.mem, dmem_contents)
+
+    model = Iss(imem_words, parse_hex(dmem_contents))
+    regs = [0] * 32
+    changes = {}
+    for _ in range(1000):
+        if model.pc >= 4 * len(imem_words):
+            break
+        commit = model.step()
+        if commit.rd and commit.value != regs[commit.rd]:
+            regs[commit.rd] = commit.value
+            changes.setdefault(commit.rd, []).append(commit.value)
+    reg, values = max(changes.items(), key=lambda item: len(item[1]))
+    assert len(values) > 1, "The test program changes no register twice"
+
+    # The regfile is cleared by the reset, like the model's
+    await cpu_reset(dut)
+    cpu = dut.soc.cpu
+
+    value = 0
+    for i, expected in enumerate(values):
+        value = await wait_for_reg_change(cpu, reg, value)
+        assert value == expected, f"x{reg} change {i}: expected 0x{expected:08x}, got 0x{value:08x}"
+
+@cocotb.test()
+async def cpu_halt_test(dut):
+    # Random programs run at full speed until the core halts on `j .`, with
+    # only the final state compared with the reference model
+    clock = start_clock(dut.clk)
+
+    rom = dut.soc.rom.mem
+    for seed in range(RANDOM_PROGRAMS, 2 * RANDOM_PROGRAMS):
+        generator = RandomProgram(seed)
+        program = generator.fill(len(rom))
+        data = generator.data()
+
+        load_words(rom, program)
+        load_words(dut.soc.ram.mem, data)
+        model = Iss(program, data)
+        model.run(len(program))
+
+        await cpu_reset(dut)
+        halt = await wait_for_halt(dut, clock, max_cycles=len(program))
+        assert halt.cause == rtl.HaltCause.self_jump, f"Seed {seed}: {halt}"
+        assert_state(dut.soc, model)
+        print(f"Seed {seed}: {halt}, {model.retired} instructions in the model")
+
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        await init_memory(rom, f.read())
@@ -0,0 +1,182 @@
+# TEST SUITE DEPENDENCIES
+#
+# Finds the `veryl test` suites of src/tests, and works out which files each
+# one depends on, so that the runner can skip suites whose inputs haven't
+# changed since they last passed:
+# - Veryl: modules, interfaces and packages are mapped to the file defining
+#   them, and each file to the definitions it uses (`inst` targets, `X::`
+#   package references, imports, generic arguments, proto bounds and
+#   `$sv::` instances of modules embedded as SystemVerilog),
+#   starting from the test file and the tops named in its #[test(...)]
+# - testbench: the `include (cocotb, "../../tb/x.py")` of the suite, and
+#   the tb modules it imports, transitively
+# - the project files and the other include_files (memory images, the Veryl
+#   sources read by typegen.py) count for every suite
+#
+# Usage:
+#   python tb/deps.py [suite ...]    lists the inputs of each suite
+
+import glob
+import hashlib
+import os
+import re
+import sys
+import tomllib
+
+REPO = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Sources passed to `veryl test` along with the suite, as in the Justfile
+SOURCE_GLOBS = (
+    "src/*.veryl",
+    "src/tests/common/*.veryl",
+    "src/peripherals/*.veryl",
+    "src/cpu/*.veryl",
+    "src/memory/*.veryl",
+    "src/cpu/load_store/*.veryl",
+    "src/cpu/writeback/*.veryl",
+)
+
+# Inputs of every suite
+PROJECT_INPUTS = ("Veryl.toml", "Veryl.lock")
+
+_TEST_ATTRIBUTE = re.compile(r"#\[test\(\s*(\w+)\s*,\s*(\w+)\s*\)\]")
+
+_DEFINITION = re.compile(r"^\s*(?:pub\s+)?(?:proto\s+|alias\s+)?(?:module|interface|package)\s+(\w+)", re.M)
+_REFERENCES = (
+    re.compile(r"\binst\s+\w+\s*:\s*(\w+)"),
+    re.compile(r"\b(\w+)\s*::"),
+    re.compile(r"\bimport\s+(\w+)"),
+    re.compile(r"\bfor\s+(\w+)\s*\{"),
+    re.compile(r"\$sv::(\w+)"),
+)
+_GENERIC_ARGS = re.compile(r"::<([^>]*)>")
+_INCLUDE = re.compile(r'include\s*\(\s*cocotb\s*,\s*"([^"]+)"\s*\)')
+_PY_IMPORT = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.M)
+
+
+class Suite:
+    def __init__(self, name, path, tests):
+        self.name = name
+        # Relative to the repository
+        self.path = path
+        # [(test name, top module)]
+        self.tests = tests
+
+
+def strip_comments(text):
+    return re.sub(r"//.*", "", text)
+
+
+def discover(repo=REPO):
+    # Suites of src/tests, skipping files without a #[test(...)]
+    suites = []
+    for path in sorted(glob.glob(os.path.join(repo, "src", "tests", "test_*.veryl"))):
+        with open(path, "r", encoding="UTF-8") as f:
+            tests = _TEST_ATTRIBUTE.findall(strip_comments(f.read()))
+        if tests:
+            name = os.path.basename(path)[len("test_"):-len(".veryl")]
+            suites.append(Suite(name, os.path.relpath(path, repo), tests))
+    return suites
+
+
+def source_files(root):
+    files = []
+    for pattern in SOURCE_GLOBS:
+        files += sorted(os.path.relpath(p, root) for p in glob.glob(os.path.join(root, pattern)))
+    return files
+
+
+class Graph:
+    def __init__(self, repo=REPO):
+        self.repo = repo
+        # Definition name -> file, files relative to the repository
+        self.definitions = {}
+        # File -> stripped source
+        self.sources = {}
+
+        files = set(source_files(repo))
+        files.update(os.path.relpath(p, repo) for p in glob.glob(os.path.join(repo, "src", "tests", "*.veryl")))
+        for path in sorted(files):
+            with open(os.path.join(repo, path), "r", encoding="UTF-8") as f:
+                text = strip_comments(f.read())
+            self.sources[path] = text
+            for name in _DEFINITION.findall(text):
+                self.definitions.setdefault(name, path)
+
+    def references(self, path):
+        # Files defining what `path` uses
+        text = self.sources[path]
+        names = set()
+        for pattern in _REFERENCES:
+            names.update(pattern.findall(text))
+        for args in _GENERIC_ARGS.findall(text):
+            names.update(re.findall(r"\w+", args))
+        return {self.definitions[name] for name in names if name in self.definitions} - {path}
+
+    def veryl_inputs(self, *paths):
+        # `paths` and everything they use, transitively
+        seen = set()
+        pending = list(paths)
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            pending.extend(self.references(current))
+        return seen
+
+    def testbench_inputs(self, path):
+        # tb modules included by a test file, with their imports
+        seen = set()
+        pending = [os.path.relpath(os.path.normpath(os.path.join(os.path.dirname(path), include)))
+                   for include in _INCLUDE.findall(self.sources[path])]
+        while pending:
+            current = pending.pop()
+            if current in seen or not os.path.exists(os.path.join(self.repo, current)):
+                continue
+            seen.add(current)
+            with open(os.path.join(self.repo, current), "r", encoding="UTF-8") as f:
+                text = f.read()
+            for match in _PY_IMPORT.finditer(text):
+                module = os.path.join(os.path.dirname(current), f"{match.group(1) or match.group(2)}.py")
+                pending.append(module)
+        return seen
+
+    def project_inputs(self):
+        # Files every suite depends on
+        inputs = set(p for p in PROJECT_INPUTS if os.path.exists(os.path.join(self.repo, p)))
+        with open(os.path.join(self.repo, "Veryl.toml"), "rb") as f:
+            config = tomllib.load(f)
+        for path in config.get("test", {}).get("include_files", []):
+            if not path.endswith(".py"):
+                inputs.add(os.path.normpath(path))
+        return inputs
+
+    def suite_roots(self, suite):
+        # The test file, and the files of the tops its #[test(...)] simulate:
+        # most test files only hold the attribute and the include
+        return [suite.path] + [self.definitions[top] for _, top in suite.tests if top in self.definitions]
+
+    def suite_inputs(self, suite):
+        veryl = self.veryl_inputs(*self.suite_roots(suite))
+        return sorted(veryl | self.testbench_inputs(suite.path) | self.project_inputs())
+
+    def suite_hash(self, suite):
+        digest = hashlib.sha256()
+        for path in self.suite_inputs(suite):
+            digest.update(path.encode() + b"\0")
+            with open(os.path.join(self.repo, path), "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    graph = Graph()
+    wanted = set(sys.argv[1:])
+    for suite in discover():
+        if wanted and suite.name not in wanted:
+            continue
+        print(f"{suite.name} {graph.suite_hash(suite)[:16]}")
+        for path in graph.suite_inputs(suite):
+            print(f"    {path}")
@@ -0,0 +1,68 @@
+# RV32I DISASSEMBLER
+#
+# Covers the same opcodes as the core (types::Opcode). Anything else is
+# shown as a raw `.word`.
+
+from iss import (
+    OP_B_TYPE, OP_I_TYPE_ALU, OP_I_TYPE_LOAD, OP_J_TYPE, OP_J_TYPE_JALR, OP_R_TYPE,
+    OP_S_TYPE, OP_U_TYPE_AUIPC, OP_U_TYPE_LUI, imm_b, imm_i, imm_j, imm_s,
+)
+
+R_OPS = {
+    (0b000, 0): "add", (0b000, 0x20): "sub", (0b001, 0): "sll", (0b010, 0): "slt",
+    (0b011, 0): "sltu", (0b100, 0): "xor", (0b101, 0): "srl", (0b101, 0x20): "sra",
+    (0b110, 0): "or", (0b111, 0): "and",
+}
+I_OPS = {0b000: "addi", 0b010: "slti", 0b011: "sltiu", 0b100: "xori", 0b110: "ori", 0b111: "andi"}
+LOAD_OPS = {0b000: "lb", 0b001: "lh", 0b010: "lw", 0b100: "lbu", 0b101: "lhu"}
+STORE_OPS = {0b000: "sb", 0b001: "sh", 0b010: "sw"}
+BRANCH_OPS = {0b000: "beq", 0b001: "bne", 0b100: "blt", 0b101: "bge", 0b110: "bltu", 0b111: "bgeu"}
+
+
+def _s(value):
+    # Signed view of a 32-bit immediate
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+def disassemble(word, pc=None):
+    op = word & 0x7F
+    rd = (word >> 7) & 0x1F
+    f3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    f7 = word >> 25
+
+    def target(offset):
+        offset = _s(offset)
+        if pc is None:
+            return f"{offset:+#x}"
+        return f"0x{(pc + offset) & 0xFFFFFFFF:x}"
+
+    if op == OP_R_TYPE and (f3, f7) in R_OPS:
+        return f"{R_OPS[(f3, f7)]} x{rd}, x{rs1}, x{rs2}"
+    if op == OP_I_TYPE_ALU:
+        if word == 0x00000013:
+            return "nop"
+        if f3 in I_OPS:
+            return f"{I_OPS[f3]} x{rd}, x{rs1}, {_s(imm_i(word))}"
+        if f3 == 0b001 and f7 == 0:
+            return f"slli x{rd}, x{rs1}, {rs2}"
+        if f3 == 0b101 and f7 in (0, 0x20):
+            return f"{'srai' if f7 else 'srli'} x{rd}, x{rs1}, {rs2}"
+    if op == OP_I_TYPE_LOAD and f3 in LOAD_OPS:
+        return f"{LOAD_OPS[f3]} x{rd}, {_s(imm_i(word))}(x{rs1})"
+    if op == OP_S_TYPE and f3 in STORE_OPS:
+        return f"{STORE_OPS[f3]} x{rs2}, {_s(imm_s(word))}(x{rs1})"
+    if op == OP_B_TYPE and f3 in BRANCH_OPS:
+        return f"{BRANCH_OPS[f3]} x{rs1}, x{rs2}, {target(imm_b(word))}"
+    if op == OP_U_TYPE_LUI:
+        return f"lui x{rd}, 0x{word >> 12:x}"
+    if op == OP_U_TYPE_AUIPC:
+        return f"auipc x{rd}, 0x{word >> 12:x}"
+    if op == OP_J_TYPE:
+        if rd == 0:
+            return f"j {target(imm_j(word))}"
+        return f"jal x{rd}, {target(imm_j(word))}"
+    if op == OP_J_TYPE_JALR and f3 == 0:
+        return f"jalr x{rd}, {_s(imm_i(word))}(x{rs1})"
+    return f".word 0x{word:08x}"
@@ -0,0 +1,145 @@
+# INSTRUCTION FEEDER
+#
+# Serves instructions to FeederSoc (src/tests/test_feeder.veryl) from Python,
+# so the CPU can run instruction streams that don't fit in the ROM.
+#
+# A source is a callable mapping an instruction address to a word:
+# - StreamSource pulls from any iterable (e.g. RandomProgram.instructions())
+#   and only keeps a sliding window of it around, so memory use stays
+#   constant however long the stream is.
+# - BufferSource indexes a word buffer, e.g. a memory-mapped image from
+#   loader.load_program().
+
+import os
+from collections import deque
+
+import cocotb
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from bintrace import TraceMonitor, TraceWriter
+from clocking import start_clock
+from commit_trace import CommitTrace
+from cosim import LockstepChecker
+from func_coverage import collect
+from iss import Iss
+from rvgen import RandomProgram
+from utils import load_words, parse_hex, to_int
+
+# Number of instructions run by feeder_random_stream_test. Set
+# FEEDER_TRACE to a path to also write the commit stream there (bintrace.py).
+STREAM_LENGTH = 20_000
+
+
+class StreamSource:
+    def __init__(self, words, start_addr=0, window=4096):
+        self._words = iter(words)
+        self.start_addr = start_addr
+        self.window = window
+        # Index of the first word still in the window
+        self._base = 0
+        self._buffer = deque()
+
+    def __call__(self, address):
+        index = (address - self.start_addr) >> 2
+        if index < self._base:
+            raise IndexError(f"0x{address:08x} fell out of the {self.window} instruction window")
+
+        buffer = self._buffer
+        while self._base + len(buffer) <= index:
+            buffer.append(next(self._words))
+            if len(buffer) > self.window:
+                buffer.popleft()
+                self._base += 1
+        return buffer[index - self._base]
+
+
+class BufferSource:
+    def __init__(self, words, start_addr=0, fill=0):
+        self.words = words
+        self.start_addr = start_addr
+        # Served past the end of the buffer
+        self.fill = fill
+
+    def __call__(self, address):
+        index = (address - self.start_addr) >> 2
+        if 0 <= index < len(self.words):
+            return self.words[index]
+        return self.fill
+
+
+class InstructionFeeder:
+    # Answers the CPU's fetches. The fetch address has settled by the falling
+    # edge, and FeederSoc latches the word on the next rising edge, just like
+    # the ROM would.
+    def __init__(self, dut, source):
+        self.source = source
+        self._clk = dut.clk
+        self._fetch_addr = dut.fetch_addr
+        self._fetch_data = dut.fetch_data
+
+    async def run(self):
+        clk = self._clk
+        fetch_addr = self._fetch_addr
+        fetch_data = self._fetch_data
+        source = self.source
+        while True:
+            await FallingEdge(clk)
+            fetch_data.value = source(to_int(fetch_addr.value))
+
+
+@cocotb.coroutine
+async def feeder_reset(dut, feeder):
+    dut.rst_n.value = 0
+    dut.fetch_data.value = 0
+    cocotb.start_soon(feeder.run())
+    await RisingEdge(dut.clk)
+    dut.rst_n.value = 1
+    await RisingEdge(dut.clk)
+    # Wait another cycle to allow the instruction fetch to propagate
+    await RisingEdge(dut.clk)
+
+
+@cocotb.test()
+async def feeder_random_stream_test(dut):
+    # An endless random stream through the real Cpu, checked against the ISS
+    start_clock(dut.clk)
+
+    length = int(os.environ.get("FEEDER_STREAM_LENGTH", STREAM_LENGTH))
+    generator = RandomProgram(seed=0)
+    data = generator.data()
+    load_words(dut.soc.ram.mem, data)
+
+    def stream():
+        yield from generator.prologue()
+        yield from generator.instructions()
+
+    # The RTL fetches one instruction ahead of the model, both read the
+    # same window of the stream. The ROM still holds its INIT_FILE, which
+    # random loads from the ROM region read.
+    source = StreamSource(stream())
+    feeder = InstructionFeeder(dut, source)
+    with open("./test_imem.hex", "r", encoding="UTF-8") as f:
+        rom = parse_hex(f.read())
+    model = Iss(rom, data, imem=source)
+
+    await feeder_reset(dut, feeder)
+
+    monitor = None
+    if os.environ.get("FEEDER_TRACE"):
+        monitor = TraceMonitor(dut.soc.cpu, TraceWriter(os.environ["FEEDER_TRACE"]))
+        cocotb.start_soon(monitor.run())
+
+    coverage = collect(dut.soc.cpu, dut.soc.mem_controller, "feeder_random_stream")
+    trace = CommitTrace()
+    checker = LockstepChecker(dut.soc.cpu, model, trace=trace)
+    try:
+        with trace.dump_on_failure():
+            checked = await checker.run(max_cycles=length)
+            assert checked == length
+        if coverage is not None:
+            coverage.save()
+    finally:
+        if monitor is not None:
+            monitor.finish()
+            monitor.writer.close()
+    print(f"{checked} streamed instructions checked against the reference model")
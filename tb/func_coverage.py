@@ -0,0 +1,279 @@
+# FUNCTIONAL COVERAGE
+#
+# Counters sampled once per commit:
+# - decode:  opcode x funct3 x funct7, indexed (op << 10) | (f3 << 7) | f7
+# - forward: per operand (WritebackMux operand1/operand2), whether the
+#            regfile value was used or the writeback was forwarded, and
+#            whether the forwarded writeback was an ALU result, a memory
+#            read or a write to x0
+# - mem_be:  byte enable mask per load/store funct3
+# - source:  RamSource per load/store (MemoryController.ram_source)
+#
+# Counters live in preallocated arrays of 64-bit integers, which no soak
+# comes close to overflowing. A Coverage serializes to a small zlib blob,
+# and any number of them (e.g. one per parallel simulation) merge by adding
+# counters.
+#
+# When TB_COVERAGE names a directory, tests call collect() to sample their
+# Cpu and save a <name>-<pid>.cov file there at the end. Only sampling needs
+# cocotb, the report and merge commands don't.
+#
+# Usage:
+#   python func_coverage.py report <file or dir>...
+#   python func_coverage.py merge <out> <file or dir>...
+
+import os
+import zlib
+from array import array
+
+from iss import (
+    OP_B_TYPE, OP_I_TYPE_ALU, OP_I_TYPE_LOAD, OP_J_TYPE, OP_J_TYPE_JALR, OP_R_TYPE,
+    OP_S_TYPE, OP_U_TYPE_AUIPC, OP_U_TYPE_LUI,
+)
+from typegen import rtl
+from utils import Writeback, to_int
+
+MAGIC = b"VHCCOV2\n"
+
+DECODE_BINS = 1 << 17
+
+# Forwarding bins, per operand
+FWD_NONE = 0
+FWD_ALU = 1
+FWD_MEM_READ = 2
+FWD_X0 = 3
+FWD_KINDS = ("regfile", "forwarded", "forwarded memory read", "forwarded x0 write")
+
+MEM_LOAD = 0
+MEM_STORE = 1
+
+RAM_SOURCES = tuple(source.name for source in sorted(rtl.RamSource))
+
+LOAD_NAMES = {0b000: "lb", 0b001: "lh", 0b010: "lw", 0b100: "lbu", 0b101: "lhu"}
+STORE_NAMES = {0b000: "sb", 0b001: "sh", 0b010: "sw"}
+BRANCH_NAMES = {0b000: "beq", 0b001: "bne", 0b100: "blt", 0b101: "bge", 0b110: "bltu", 0b111: "bgeu"}
+R_NAMES = {
+    (0b000, 0): "add", (0b000, 0x20): "sub", (0b001, 0): "sll", (0b010, 0): "slt",
+    (0b011, 0): "sltu", (0b100, 0): "xor", (0b101, 0): "srl", (0b101, 0x20): "sra",
+    (0b110, 0): "or", (0b111, 0): "and",
+}
+I_NAMES = {0b000: "addi", 0b010: "slti", 0b011: "sltiu", 0b100: "xori", 0b110: "ori", 0b111: "andi"}
+
+
+def decode_index(instruction):
+    return ((instruction & 0x7F) << 10) | (((instruction >> 12) & 0x7) << 7) | (instruction >> 25)
+
+
+def decode_points():
+    # Every encoding the core implements, as (name, op, f3, f7).
+    # f3/f7 are None where the field is part of an immediate.
+    points = [(name, OP_R_TYPE, f3, f7) for (f3, f7), name in R_NAMES.items()]
+    points += [(name, OP_I_TYPE_ALU, f3, None) for f3, name in I_NAMES.items()]
+    points += [("slli", OP_I_TYPE_ALU, 0b001, 0), ("srli", OP_I_TYPE_ALU, 0b101, 0), ("srai", OP_I_TYPE_ALU, 0b101, 0x20)]
+    points += [(name, OP_I_TYPE_LOAD, f3, None) for f3, name in LOAD_NAMES.items()]
+    points += [(name, OP_S_TYPE, f3, None) for f3, name in STORE_NAMES.items()]
+    points += [(name, OP_B_TYPE, f3, None) for f3, name in BRANCH_NAMES.items()]
+    points += [
+        ("lui", OP_U_TYPE_LUI, None, None),
+        ("auipc", OP_U_TYPE_AUIPC, None, None),
+        ("jal", OP_J_TYPE, None, None),
+        ("jalr", OP_J_TYPE_JALR, 0b000, None),
+    ]
+    return points
+
+
+class Coverage:
+    def __init__(self):
+        self.samples = 0
+        self.decode = array("Q", bytes(8 * DECODE_BINS))
+        # [operand][kind]
+        self.forward = array("Q", bytes(8 * 2 * 4))
+        # [load/store][f3][mask]
+        self.mem_be = array("Q", bytes(8 * 2 * 8 * 16))
+        # [load/store][source]
+        self.source = array("Q", bytes(8 * 2 * 4))
+
+    def _tables(self):
+        return (self.decode, self.forward, self.mem_be, self.source)
+
+    # -- Serialization --
+
+    def to_bytes(self):
+        body = array("Q", [self.samples]).tobytes() + b"".join(t.tobytes() for t in self._tables())
+        return MAGIC + zlib.compress(body, 6)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data.startswith(MAGIC):
+            raise ValueError("Not a coverage file")
+        body = memoryview(zlib.decompress(data[len(MAGIC):]))
+        coverage = cls()
+        coverage.samples = body[:8].cast("Q")[0]
+        offset = 8
+        for table in coverage._tables():
+            size = len(table) * table.itemsize
+            table[:] = array(table.typecode, body[offset:offset + size].cast(table.typecode))
+            offset += size
+        if offset != len(body):
+            raise ValueError("Coverage file does not match the current bins")
+        return coverage
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def merge(self, other):
+        self.samples += other.samples
+        for mine, theirs in zip(self._tables(), other._tables()):
+            for i, count in enumerate(theirs):
+                if count:
+                    mine[i] += count
+        return self
+
+    # -- Report --
+
+    def decode_hits(self, op, f3=None, f7=None):
+        f3s = range(8) if f3 is None else (f3,)
+        f7s = range(128) if f7 is None else (f7,)
+        decode = self.decode
+        return sum(decode[(op << 10) | (a << 7) | b] for a in f3s for b in f7s)
+
+    def report(self):
+        lines = [f"{self.samples} commits sampled", "", "Decode:"]
+        points = decode_points()
+        missed = []
+        for name, op, f3, f7 in points:
+            hits = self.decode_hits(op, f3, f7)
+            lines.append(f"  {name:<8} {hits:>12}")
+            if not hits:
+                missed.append(name)
+        lines.append(f"  {len(points) - len(missed)}/{len(points)} encodings hit"
+                     + (f", missed: {' '.join(missed)}" if missed else ""))
+
+        lines += ["", "Forwarding:"]
+        for operand in range(2):
+            counts = self.forward[4 * operand:4 * operand + 4]
+            lines.append(f"  operand{operand + 1}: " + ", ".join(
+                f"{kind} {count}" for kind, count in zip(FWD_KINDS, counts)))
+
+        lines += ["", "Byte enables:"]
+        for kind, names in ((MEM_LOAD, LOAD_NAMES), (MEM_STORE, STORE_NAMES)):
+            for f3, name in names.items():
+                base = (kind * 8 + f3) * 16
+                masks = [f"0b{mask:04b} {self.mem_be[base + mask]}" for mask in range(16) if self.mem_be[base + mask]]
+                lines.append(f"  {name:<4} " + (", ".join(masks) if masks else "not hit"))
+
+        lines += ["", "Ram source:"]
+        for kind, name in ((MEM_LOAD, "load"), (MEM_STORE, "store")):
+            lines.append(f"  {name:<5} " + ", ".join(
+                f"{source} {self.source[4 * kind + i]}" for i, source in enumerate(RAM_SOURCES)))
+        return "\n".join(lines)
+
+
+class CoverageCollector:
+    # Samples a Cpu once per clock. mem_controller is optional, without it
+    # the ram source bins stay empty.
+    def __init__(self, cpu, mem_controller=None, coverage=None, path=None):
+        self.coverage = coverage or Coverage()
+        self.path = path
+        self._clk = cpu.clk
+        self._instruction = cpu.instruction
+        self._next_writeback = cpu.next_writeback
+        self._writeback = cpu.writeback
+        self._wb_enable = cpu.reg_write_port.write_enable
+        self._dmem_be = cpu.dmem_byte_write_enable
+        self._ram_source = mem_controller.ram_source if mem_controller is not None else None
+
+    def sample(self):
+        cov = self.coverage
+        cov.samples += 1
+        instruction = to_int(self._instruction.value)
+        cov.decode[decode_index(instruction)] += 1
+
+        # The writeback of the previous instruction is being written this
+        # cycle, WritebackMux forwards it if a source register matches
+        if to_int(self._wb_enable.value):
+            wb = Writeback(to_int(self._writeback.value))
+            if wb.dest_reg == 0:
+                kind = FWD_X0
+            elif wb.is_mem_read:
+                kind = FWD_MEM_READ
+            else:
+                kind = FWD_ALU
+            rs1 = (instruction >> 15) & 0x1F
+            rs2 = (instruction >> 20) & 0x1F
+            cov.forward[kind if rs1 == wb.dest_reg else FWD_NONE] += 1
+            cov.forward[4 + (kind if rs2 == wb.dest_reg else FWD_NONE)] += 1
+        else:
+            cov.forward[FWD_NONE] += 1
+            cov.forward[4 + FWD_NONE] += 1
+
+        op = instruction & 0x7F
+        if op == OP_I_TYPE_LOAD:
+            kind = MEM_LOAD
+            be = Writeback(to_int(self._next_writeback.value)).byte_enable_mask
+        elif op == OP_S_TYPE:
+            kind = MEM_STORE
+            be = to_int(self._dmem_be.value)
+        else:
+            return
+        cov.mem_be[(kind * 8 + ((instruction >> 12) & 0x7)) * 16 + be] += 1
+        if self._ram_source is not None:
+            cov.source[4 * kind + to_int(self._ram_source.value)] += 1
+
+    async def run(self):
+        from cocotb.triggers import RisingEdge
+
+        clk = self._clk
+        while True:
+            self.sample()
+            await RisingEdge(clk)
+
+    def save(self):
+        if self.path is not None:
+            self.coverage.save(self.path)
+
+
+def collect(cpu, mem_controller=None, name="coverage"):
+    # Start sampling `cpu` if TB_COVERAGE is set. Returns the collector,
+    # whose save() writes the counters out, or None.
+    import cocotb
+
+    directory = os.environ.get("TB_COVERAGE")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{os.getpid()}.cov")
+    collector = CoverageCollector(cpu, mem_controller, path=path)
+    cocotb.start_soon(collector.run())
+    return collector
+
+
+def load_all(paths):
+    # Merge coverage files, directories are searched for *.cov
+    merged = Coverage()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".cov"))
+        else:
+            files = [path]
+        for file in files:
+            merged.merge(Coverage.load(file))
+    return merged
+
+
+if __name__ == "__main__":
+    import sys
+
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "report":
+        print(load_all(args).report())
+    elif command == "merge":
+        load_all(args[1:]).save(args[0])
+    else:
+        sys.exit(f"Unknown command {command}")
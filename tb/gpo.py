@@ -0,0 +1,94 @@
+import random
+
+import cocotb
+from cocotb.triggers import RisingEdge
+from cocotb.utils import get_sim_time
+
+from bram_bfm import BramMaster, BramMonitor
+from clocking import start_clock
+
+TRANSACTIONS = 5000
+
+
+def gpo_model(out, transaction):
+    # Output pins after a bus transaction, like Gpo
+    if transaction.address >= 4:
+        return out
+    data = transaction.write_data
+    if transaction.byte_enable == 0b001:
+        return data & 0xFF
+    if transaction.byte_enable == 0b010:
+        return out & ~(data >> 8) & 0xFF
+    if transaction.byte_enable == 0b100:
+        return out | (data >> 16) & 0xFF
+    return out
+
+
+class MonitorScoreboard:
+    # Runs gpo_model over the transactions seen by a BramMonitor. Each one
+    # is observed right after the edge that sampled it, when the pins and
+    # the read data still hold the value from before it.
+    def __init__(self, gpo_out):
+        self.gpo_out = gpo_out
+        self.out = 0
+        self.count = 0
+        self.errors = []
+
+    def observe(self, transaction):
+        pins = int(self.gpo_out.value)
+        if pins != self.out:
+            self.errors.append(f"Transaction {self.count}, {transaction}: gpo_out is 0x{pins:02x}, expected 0x{self.out:02x}")
+        expected = self.out * 0x010101
+        if transaction.read_data != expected:
+            self.errors.append(f"Transaction {self.count}, {transaction}: read data 0x{transaction.read_data:08x}, expected 0x{expected:08x}")
+        self.out = gpo_model(self.out, transaction)
+        self.count += 1
+
+
+def random_transaction(master, rng):
+    address = rng.choice((0, 0, 0, 0, 1, 2, 3, 4, 8))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return master.read(address)
+    # Mostly the three registers, sometimes an unsupported byte enable
+    byte_enable = (0b001, 0b010, 0b100, rng.randrange(16))[kind - 1]
+    return master.write(address, rng.randrange(1 << 32), byte_enable)
+
+
+@cocotb.test()
+async def gpo_bus_test(dut):
+    clock = start_clock(dut.clk)
+    master = BramMaster(dut.bus, dut.clk).start()
+    scoreboard = MonitorScoreboard(dut.gpo_out)
+    BramMonitor(dut.bus, dut.clk, scoreboard.observe).start()
+
+    dut.rst_n.value = 0
+    await RisingEdge(dut.clk)
+    dut.rst_n.value = 1
+    await RisingEdge(dut.clk)
+
+    # Back to back transactions, checked once they have all completed
+    rng = random.Random(0)
+    start = get_sim_time("step")
+    transactions = [random_transaction(master, rng) for _ in range(TRANSACTIONS)]
+    await master.wait_idle()
+    cycles = (get_sim_time("step") - start) // clock.period
+
+    assert cycles <= TRANSACTIONS + 1, f"{TRANSACTIONS} transactions took {cycles} cycles"
+
+    out = 0
+    for i, transaction in enumerate(transactions):
+        if not transaction.is_write:
+            # Every byte lane but the top one mirrors the pins
+            expected = out * 0x010101
+            assert transaction.read_data == expected, f"Transaction {i}, {transaction}: expected read data 0x{expected:08x}"
+        out = gpo_model(out, transaction)
+
+    assert int(dut.gpo_out.value) == out, f"gpo_out is 0x{int(dut.gpo_out.value):02x}, expected 0x{out:02x}"
+
+    # The monitor's view, checked against the reference model and the pins
+    # rather than against what the master issued
+    assert scoreboard.count == TRANSACTIONS, f"Monitor saw {scoreboard.count} transactions, expected {TRANSACTIONS}"
+    assert not scoreboard.errors, "\n".join(scoreboard.errors[:10])
+    pins = int(dut.gpo_out.value)
+    assert scoreboard.out == pins, f"Monitor model ended at 0x{scoreboard.out:02x}, gpo_out is 0x{pins:02x}"
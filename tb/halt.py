@@ -0,0 +1,45 @@
+# HALT DETECTION
+#
+# Waits for the HaltDetector (src/halt_detector.veryl) of a test top to flag
+# the end of a program. The test tops (TestSoc, FeederSoc) instantiate it
+# next to the SoC and bring its halted/cause/cycles out as ports. The
+# detector runs in the simulator, so Python sleeps until `halted` rises or
+# the cycle budget runs out, with nothing to do on the cycles in between.
+
+from cocotb.triggers import First, RisingEdge, Timer
+
+from typegen import rtl
+
+
+class HaltTimeout(AssertionError):
+    pass
+
+
+class Halt:
+    __slots__ = ("cause", "cycles")
+
+    def __init__(self, cause, cycles):
+        self.cause = cause
+        # Cycles from reset release to the halt
+        self.cycles = cycles
+
+    def __str__(self):
+        return f"halted ({self.cause.name}) after {self.cycles} cycles"
+
+
+def halt_status(top):
+    if not int(top.halted.value):
+        return None
+    return Halt(rtl.HaltCause(int(top.cause.value)), int(top.cycles.value))
+
+
+async def wait_for_halt(top, clock, max_cycles):
+    # Wait until the halted port of `top` rises, for at most `max_cycles`
+    # cycles of `clock` (a clocking.SimClock). Returns a Halt.
+    halt = halt_status(top)
+    if halt is None:
+        await First(RisingEdge(top.halted), Timer(max_cycles * clock.period, "step"))
+        halt = halt_status(top)
+    if halt is None:
+        raise HaltTimeout(f"No halt within {max_cycles} cycles")
+    return halt
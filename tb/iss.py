@@ -0,0 +1,599 @@
+# RV32I INSTRUCTION SET SIMULATOR
+#
+# Golden reference model for the CPU. It covers exactly the opcodes of
+# types::Opcode and uses the same memory map as the test SoC.
+#
+# Where the ISA leaves room (or where the core has no trap support), the
+# model does what the RTL does:
+# - Unknown opcodes, and branch/load/store f3 values that the core does not
+#   decode, execute as no-ops.
+# - Misaligned loads and stores are dropped: no memory write, no register write.
+# - slli/srli/srai with a malformed f7 don't write back, and an R-type
+#   srl/sra with an unknown f7 writes 0.
+# - ROM is readable through loads but ignores stores. Accesses outside of
+#   every region read as 0 and ignore stores.
+# - The peripheral bus only models the GPO (see GpoModel).
+#
+# Each instruction word is decoded once into a closure that executes it.
+# Closures are cached per word, and the ROM additionally keeps a per-address
+# table of them so the run loop is a list lookup plus a call.
+
+from mem_config import TEST_MEMORY_MAP
+from typegen import rtl
+
+MASK = 0xFFFFFFFF
+
+# Maximum number of distinct decoded instruction words kept around
+DECODE_CACHE_SIZE = 1 << 16
+
+# Opcodes (types::Opcode), as plain ints for the decoder
+OP_R_TYPE = int(rtl.Opcode.r_type)
+OP_I_TYPE_ALU = int(rtl.Opcode.i_type_alu)
+OP_I_TYPE_LOAD = int(rtl.Opcode.i_type_load)
+OP_S_TYPE = int(rtl.Opcode.s_type)
+OP_B_TYPE = int(rtl.Opcode.b_type)
+OP_U_TYPE_LUI = int(rtl.Opcode.u_type_lui)
+OP_U_TYPE_AUIPC = int(rtl.Opcode.u_type_auipc)
+OP_J_TYPE = int(rtl.Opcode.j_type)
+OP_J_TYPE_JALR = int(rtl.Opcode.j_type_jalr)
+
+OPCODES = (
+    OP_R_TYPE, OP_I_TYPE_ALU, OP_I_TYPE_LOAD, OP_S_TYPE, OP_B_TYPE,
+    OP_U_TYPE_LUI, OP_U_TYPE_AUIPC, OP_J_TYPE, OP_J_TYPE_JALR,
+)
+
+# Byte enables of a load/store, indexed by [f3][address offset]
+# (mirrors LoadStoreDecoder)
+BYTE_ENABLES = {
+    0b000: (0b0001, 0b0010, 0b0100, 0b1000),  # byte
+    0b100: (0b0001, 0b0010, 0b0100, 0b1000),  # byte_u
+    0b001: (0b0011, 0b0000, 0b1100, 0b0000),  # halfword
+    0b101: (0b0011, 0b0000, 0b1100, 0b0000),  # halfword_u
+    0b010: (0b1111, 0b0000, 0b0000, 0b0000),  # word
+}
+NO_BYTE_ENABLES = (0, 0, 0, 0)
+
+BE_MASKS = [
+    sum(0xFF << (8 * i) for i in range(4) if (be >> i) & 1)
+    for be in range(16)
+]
+
+
+def sext(value, bits):
+    sign = 1 << (bits - 1)
+    return ((value & (sign - 1)) - (value & sign)) & MASK
+
+
+def imm_i(word):
+    return sext(word >> 20, 12)
+
+
+def imm_s(word):
+    return sext(((word >> 25) << 5) | ((word >> 7) & 0x1F), 12)
+
+
+def imm_b(word):
+    return sext(
+        ((word >> 31) << 12)
+        | (((word >> 7) & 1) << 11)
+        | (((word >> 25) & 0x3F) << 5)
+        | (((word >> 8) & 0xF) << 1),
+        13,
+    )
+
+
+def imm_u(word):
+    return word & 0xFFFFF000
+
+
+def imm_j(word):
+    return sext(
+        ((word >> 31) << 20)
+        | (((word >> 12) & 0xFF) << 12)
+        | (((word >> 20) & 1) << 11)
+        | (((word >> 21) & 0x3FF) << 1),
+        21,
+    )
+
+
+def _signed(value):
+    return value - ((value & 0x80000000) << 1)
+
+
+def alu(f3, f7, a, b, is_r_type):
+    # Returns the ALU result, or None when the core does not write back
+    shamt = b & 0x1F
+    if f3 == 0b000:
+        if is_r_type and f7 & 0x20:
+            return (a - b) & MASK
+        return (a + b) & MASK
+    if f3 == 0b001:
+        if not is_r_type and f7 != 0:
+            return None
+        return (a << shamt) & MASK
+    if f3 == 0b010:
+        return int(_signed(a) < _signed(b))
+    if f3 == 0b011:
+        return int(a < b)
+    if f3 == 0b100:
+        return a ^ b
+    if f3 == 0b101:
+        if f7 == 0:
+            return a >> shamt
+        if f7 == 0x20:
+            return (_signed(a) >> shamt) & MASK
+        # Undefined ALU control: the ALU outputs 0, and R-types still write it
+        return 0 if is_r_type else None
+    if f3 == 0b110:
+        return a | b
+    return a & b
+
+
+def branch_taken(f3, a, b):
+    if f3 == 0b000:
+        return a == b
+    if f3 == 0b001:
+        return a != b
+    if f3 == 0b100:
+        return _signed(a) < _signed(b)
+    if f3 == 0b101:
+        return _signed(a) >= _signed(b)
+    if f3 == 0b110:
+        return a < b
+    if f3 == 0b111:
+        return a >= b
+    return False
+
+
+def load_value(f3, be, word):
+    # Mirrors Reader
+    data = word & BE_MASKS[be]
+    if f3 == 0b010:
+        return data
+    if f3 in (0b000, 0b100):
+        shift = {0b0001: 0, 0b0010: 8, 0b0100: 16, 0b1000: 24}[be]
+        value = (data >> shift) & 0xFF
+        return sext(value, 8) if f3 == 0b000 else value
+    shift = 0 if be == 0b0011 else 16
+    value = (data >> shift) & 0xFFFF
+    return sext(value, 16) if f3 == 0b001 else value
+
+
+def store_data(f3, offset, value):
+    # Mirrors LoadStoreDecoder
+    if f3 in (0b000, 0b100):
+        return ((value & 0xFF) << (8 * offset)) & MASK
+    if f3 in (0b001, 0b101):
+        return ((value & 0xFFFF) << (8 * offset)) & MASK
+    return value
+
+
+class GpoModel:
+    # Mirrors PeripheralMux + Gpo. Word indexes 0-3 of the peripheral bus
+    # select the GPO; byte lane 0 sets the output, lane 1 clears bits and
+    # lane 2 sets bits.
+    def __init__(self, num_pins=8):
+        self.mask = (1 << num_pins) - 1
+        self.out = 0
+
+    def read(self, index):
+        if index < 4:
+            return (self.out << 16) | (self.out << 8) | self.out
+        return 0
+
+    def write(self, index, data, be):
+        if index >= 4:
+            return
+        if be == 0b0001:
+            self.out = data & 0xFF & self.mask
+        elif be == 0b0010:
+            self.out &= ~((data >> 8) & 0xFF) & self.mask
+        elif be == 0b0100:
+            self.out |= (data >> 16) & 0xFF & self.mask
+
+
+class Commit:
+    __slots__ = ("pc", "instruction", "rd", "value", "mem_addr", "mem_be", "mem_wdata")
+
+    def __init__(self, pc, instruction, rd, value, mem_addr, mem_be, mem_wdata):
+        self.pc = pc
+        self.instruction = instruction
+        # Destination register and value, rd is None when nothing is written back
+        self.rd = rd
+        self.value = value
+        # Data memory access (mem_wdata is None for loads), mem_addr is None
+        # for instructions that don't touch memory
+        self.mem_addr = mem_addr
+        self.mem_be = mem_be
+        self.mem_wdata = mem_wdata
+
+    def __str__(self):
+        s = f"pc 0x{self.pc:08x} instr 0x{self.instruction:08x}"
+        if self.rd is not None:
+            s += f" x{self.rd} <= 0x{self.value:08x}"
+        if self.mem_addr is not None:
+            kind = "load" if self.mem_wdata is None else f"store 0x{self.mem_wdata:08x}"
+            s += f" {kind} @ 0x{self.mem_addr:08x} be 0b{self.mem_be:04b}"
+        return s
+
+
+class Iss:
+    def __init__(self, rom, ram=None, memory_map=TEST_MEMORY_MAP, periph=None, imem=None):
+        rom_region, ram_region, periph_region = memory_map
+        self.rom_region = rom_region
+        self.ram_region = ram_region
+        self.periph_region = periph_region
+
+        self.rom = [0] * rom_region.depth
+        self.rom[:len(rom)] = [int(w) for w in rom]
+        self.ram = [0] * ram_region.depth
+        if ram is not None:
+            self.ram[:len(ram)] = [int(w) for w in ram]
+        self.periph = periph or GpoModel()
+        # Optional instruction source, address -> word. When set, instructions
+        # are fetched from it instead of the ROM (see feeder.py); the ROM is
+        # then only reachable through loads.
+        self.imem = imem
+
+        self.regs = [0] * 32
+        self.pc = rom_region.start_addr
+        self.retired = 0
+
+        # Last data memory access: (word address, byte enable, write data or None)
+        self.last_mem = None
+
+        self._decoded = {}
+        self._icache = [None] * rom_region.depth
+
+    @classmethod
+    def from_images(cls, images, memory_map=TEST_MEMORY_MAP, periph=None):
+        # Build from loader.load_program() output
+        rom_region, ram_region, _ = memory_map
+        return cls(
+            images.get(rom_region.name, []),
+            images.get(ram_region.name),
+            memory_map,
+            periph,
+        )
+
+    # -- Memory --
+
+    def read_word(self, address):
+        ram_region = self.ram_region
+        if ram_region.start_addr <= address < ram_region.end_addr:
+            return self.ram[(address - ram_region.start_addr) >> 2]
+        rom_region = self.rom_region
+        if rom_region.start_addr <= address < rom_region.end_addr:
+            return self.rom[(address - rom_region.start_addr) >> 2]
+        periph_region = self.periph_region
+        if periph_region.start_addr <= address < periph_region.end_addr:
+            return self.periph.read((address - periph_region.start_addr) >> 2)
+        return 0
+
+    def write_word(self, address, data, be):
+        ram_region = self.ram_region
+        if ram_region.start_addr <= address < ram_region.end_addr:
+            index = (address - ram_region.start_addr) >> 2
+            mask = BE_MASKS[be]
+            self.ram[index] = (self.ram[index] & ~mask) | (data & mask)
+            return
+        periph_region = self.periph_region
+        if periph_region.start_addr <= address < periph_region.end_addr:
+            self.periph.write((address - periph_region.start_addr) >> 2, data, be)
+
+    def load_byte(self, address):
+        return (self.read_word(address & ~3) >> (8 * (address & 3))) & 0xFF
+
+    # -- Decode --
+
+    def decode(self, word):
+        fn = self._decoded.get(word)
+        if fn is None:
+            # Unbounded random streams could grow the cache forever
+            if len(self._decoded) >= DECODE_CACHE_SIZE:
+                self._decoded.clear()
+            fn = self._decode(word)
+            self._decoded[word] = fn
+        return fn
+
+    def _decode(self, word):
+        op = word & 0x7F
+        rd = (word >> 7) & 0x1F
+        f3 = (word >> 12) & 0x7
+        rs1 = (word >> 15) & 0x1F
+        rs2 = (word >> 20) & 0x1F
+        f7 = word >> 25
+
+        if op == OP_R_TYPE or op == OP_I_TYPE_ALU:
+            return self._decode_alu(op, rd, f3, rs1, rs2, f7, imm_i(word))
+        if op == OP_I_TYPE_LOAD:
+            return self._decode_load(rd, f3, rs1, imm_i(word))
+        if op == OP_S_TYPE:
+            return self._decode_store(f3, rs1, rs2, imm_s(word))
+        if op == OP_B_TYPE:
+            return self._decode_branch(f3, rs1, rs2, imm_b(word))
+        if op == OP_U_TYPE_LUI:
+            imm = imm_u(word)
+            if rd == 0:
+                return _nop
+            def lui(regs, pc):
+                regs[rd] = imm
+                return pc + 4
+            return lui
+        if op == OP_U_TYPE_AUIPC:
+            imm = imm_u(word)
+            if rd == 0:
+                return _nop
+            def auipc(regs, pc):
+                regs[rd] = (pc + imm) & MASK
+                return pc + 4
+            return auipc
+        if op == OP_J_TYPE:
+            imm = imm_j(word)
+            def jal(regs, pc):
+                if rd:
+                    regs[rd] = (pc + 4) & MASK
+                return (pc + imm) & MASK
+            return jal
+        if op == OP_J_TYPE_JALR:
+            imm = imm_i(word)
+            def jalr(regs, pc):
+                target = ((regs[rs1] + imm) & MASK) & ~1
+                if rd:
+                    regs[rd] = (pc + 4) & MASK
+                return target
+            return jalr
+        return _nop
+
+    def _decode_alu(self, op, rd, f3, rs1, rs2, f7, imm):
+        is_r_type = op == OP_R_TYPE
+        if is_r_type:
+            if rd == 0:
+                return _nop
+            # Specialise the common cases, fall back to the generic ALU
+            if f3 == 0b000 and f7 & 0x20:
+                def sub(regs, pc):
+                    regs[rd] = (regs[rs1] - regs[rs2]) & MASK
+                    return pc + 4
+                return sub
+            if f3 == 0b000:
+                def add(regs, pc):
+                    regs[rd] = (regs[rs1] + regs[rs2]) & MASK
+                    return pc + 4
+                return add
+            if f3 == 0b111:
+                def and_(regs, pc):
+                    regs[rd] = regs[rs1] & regs[rs2]
+                    return pc + 4
+                return and_
+            if f3 == 0b110:
+                def or_(regs, pc):
+                    regs[rd] = regs[rs1] | regs[rs2]
+                    return pc + 4
+                return or_
+            if f3 == 0b100:
+                def xor(regs, pc):
+                    regs[rd] = regs[rs1] ^ regs[rs2]
+                    return pc + 4
+                return xor
+            def r_type(regs, pc):
+                regs[rd] = alu(f3, f7, regs[rs1], regs[rs2], True)
+                return pc + 4
+            return r_type
+
+        # Shifts with a malformed f7 never write back
+        if alu(f3, f7, 0, imm, False) is None or rd == 0:
+            return _nop
+        if f3 == 0b000:
+            def addi(regs, pc):
+                regs[rd] = (regs[rs1] + imm) & MASK
+                return pc + 4
+            return addi
+        if f3 == 0b111:
+            def andi(regs, pc):
+                regs[rd] = regs[rs1] & imm
+                return pc + 4
+            return andi
+        if f3 == 0b110:
+            def ori(regs, pc):
+                regs[rd] = regs[rs1] | imm
+                return pc + 4
+            return ori
+        if f3 == 0b100:
+            def xori(regs, pc):
+                regs[rd] = regs[rs1] ^ imm
+                return pc + 4
+            return xori
+        def i_type(regs, pc):
+            regs[rd] = alu(f3, f7, regs[rs1], imm, False)
+            return pc + 4
+        return i_type
+
+    def _decode_load(self, rd, f3, rs1, imm):
+        enables = BYTE_ENABLES.get(f3, NO_BYTE_ENABLES)
+        read_word = self.read_word
+        iss = self
+
+        if f3 == 0b010:
+            ram = self.ram
+            ram_start = self.ram_region.start_addr
+            ram_end = self.ram_region.end_addr
+            def lw(regs, pc):
+                address = (regs[rs1] + imm) & MASK
+                word_address = address & ~3
+                if address & 3:
+                    iss.last_mem = (word_address, 0, None)
+                    return pc + 4
+                if ram_start <= address < ram_end:
+                    value = ram[(address - ram_start) >> 2]
+                else:
+                    value = read_word(address)
+                if rd:
+                    regs[rd] = value
+                iss.last_mem = (word_address, 0b1111, None)
+                return pc + 4
+            return lw
+
+        def load(regs, pc):
+            address = (regs[rs1] + imm) & MASK
+            word_address = address & ~3
+            be = enables[address & 3]
+            if be and rd:
+                regs[rd] = load_value(f3, be, read_word(word_address))
+            iss.last_mem = (word_address, be, None)
+            return pc + 4
+        return load
+
+    def _decode_store(self, f3, rs1, rs2, imm):
+        enables = BYTE_ENABLES.get(f3, NO_BYTE_ENABLES)
+        write_word = self.write_word
+        iss = self
+
+        def store(regs, pc):
+            address = (regs[rs1] + imm) & MASK
+            word_address = address & ~3
+            offset = address & 3
+            be = enables[offset]
+            data = store_data(f3, offset, regs[rs2])
+            if be:
+                write_word(word_address, data, be)
+            iss.last_mem = (word_address, be, data)
+            return pc + 4
+        return store
+
+    def _decode_branch(self, f3, rs1, rs2, imm):
+        if f3 == 0b000:
+            def beq(regs, pc):
+                return (pc + imm) & MASK if regs[rs1] == regs[rs2] else pc + 4
+            return beq
+        if f3 == 0b001:
+            def bne(regs, pc):
+                return (pc + imm) & MASK if regs[rs1] != regs[rs2] else pc + 4
+            return bne
+        if f3 not in (0b100, 0b101, 0b110, 0b111):
+            return _nop
+        def branch(regs, pc):
+            return (pc + imm) & MASK if branch_taken(f3, regs[rs1], regs[rs2]) else pc + 4
+        return branch
+
+    # -- Execution --
+
+    def fetch(self, pc):
+        if self.imem is not None:
+            return self.decode(self.imem(pc))
+        index = (pc - self.rom_region.start_addr) >> 2
+        if pc & 3 or not 0 <= index < len(self.rom):
+            raise IndexError(f"Instruction fetch outside of ROM at 0x{pc:08x}")
+        fn = self._icache[index]
+        if fn is None:
+            fn = self.decode(self.rom[index])
+            self._icache[index] = fn
+        return fn
+
+    def run(self, max_steps):
+        # Run until `max_steps` instructions retired or the program jumps to
+        # itself (`j .`). Returns the number of instructions retired.
+        if self.imem is not None:
+            return self._run_stream(max_steps)
+
+        regs = self.regs
+        icache = self._icache
+        base = self.rom_region.start_addr
+        pc = self.pc
+
+        n = 0
+        try:
+            while n < max_steps:
+                fn = icache[(pc - base) >> 2]
+                if fn is None:
+                    fn = self.fetch(pc)
+                next_pc = fn(regs, pc)
+                n += 1
+                if next_pc != pc + 4:
+                    if next_pc == pc:
+                        break
+                    if next_pc & 3 or next_pc < base:
+                        pc = next_pc
+                        raise IndexError
+                pc = next_pc
+        except IndexError:
+            self.pc = pc
+            self.retired += n
+            raise IndexError(f"Instruction fetch outside of ROM at 0x{pc:08x}") from None
+
+        self.pc = pc
+        self.retired += n
+        return n
+
+    def _run_stream(self, max_steps):
+        regs = self.regs
+        imem = self.imem
+        decode = self.decode
+        pc = self.pc
+
+        n = 0
+        while n < max_steps:
+            next_pc = decode(imem(pc))(regs, pc)
+            n += 1
+            if next_pc == pc:
+                break
+            pc = next_pc
+
+        self.pc = pc
+        self.retired += n
+        return n
+
+    def step(self):
+        # Execute a single instruction and describe what it did
+        pc = self.pc
+        if self.imem is not None:
+            # One lookup of the instruction source, decoded through the cache
+            word = self.imem(pc)
+            fn = self.decode(word)
+        else:
+            fn = self.fetch(pc)
+            word = self.rom[(pc - self.rom_region.start_addr) >> 2]
+
+        rd = (word >> 7) & 0x1F
+        op = word & 0x7F
+        self.last_mem = None
+        self.pc = fn(self.regs, pc)
+        self.retired += 1
+
+        # Only report register writes that the core actually performs
+        writes = op in (OP_R_TYPE, OP_U_TYPE_LUI, OP_U_TYPE_AUIPC, OP_J_TYPE, OP_J_TYPE_JALR)
+        if op == OP_I_TYPE_ALU:
+            writes = alu((word >> 12) & 0x7, word >> 25, 0, imm_i(word), False) is not None
+        elif op == OP_I_TYPE_LOAD:
+            writes = self.last_mem[1] != 0
+        if not writes or rd == 0:
+            rd_out, value = None, None
+        else:
+            rd_out, value = rd, self.regs[rd]
+
+        if self.last_mem is None:
+            return Commit(pc, word, rd_out, value, None, None, None)
+        address, be, data = self.last_mem
+        return Commit(pc, word, rd_out, value, address, be, data)
+
+
+def _nop(regs, pc):
+    return pc + 4
+
+
+if __name__ == "__main__":
+    # Standalone run: python iss.py program [max_steps]
+    import sys
+    import time
+
+    from loader import load_program
+
+    images = load_program(sys.argv[1])
+    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000
+    iss = Iss.from_images(images)
+    start = time.perf_counter()
+    retired = iss.run(max_steps)
+    elapsed = time.perf_counter() - start
+    print(f"{retired} instructions in {elapsed:.3f}s ({retired / elapsed / 1e6:.2f} MIPS), pc = 0x{iss.pc:08x}")
+    for i in range(0, 32, 4):
+        print("  ".join(f"x{r:<2} {iss.regs[r]:08x}" for r in range(i, i + 4)))
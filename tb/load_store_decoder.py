@@ -1,9 +1,14 @@
 import cocotb
 from cocotb.triggers import Timer
-import random
+import numpy as np
 
-@cocotb.test()
-async def ls_unit_test(dut):
+from stimulus import random_test
+from vectors import check, drive, load_store_model, random_words
+
+VECTORS = 200_000
+
+@random_test(100)
+async def ls_unit_test(dut, stimulus):
     word = 0x123ABC00
 
     # ====
@@ -11,8 +16,8 @@ async def ls_unit_test(dut):
     # ====
     dut.f3.value = 0b010
 
-    for _ in range(100):
-        reg_data = random.randint(0, 0xFFFFFFFF)
+    for rng in stimulus:
+        reg_data = rng.randint(0, 0xFFFFFFFF)
         dut.data_in.value = reg_data
         for offset in range(4):
             dut.address.value = word | offset
@@ -30,8 +35,8 @@ async def ls_unit_test(dut):
 
     dut.f3.value = 0b000
 
-    for _ in range(100):
-        reg_data = random.randint(0, 0xFFFFFFFF)
+    for rng in stimulus:
+        reg_data = rng.randint(0, 0xFFFFFFFF)
         dut.data_in.value = reg_data
         for offset in range(4):
             dut.address.value = word | offset
@@ -46,8 +51,8 @@ async def ls_unit_test(dut):
 
     dut.f3.value = 0b001
     
-    for _ in range(100):
-        reg_data = random.randint(0, 0xFFFFFFFF)
+    for rng in stimulus:
+        reg_data = rng.randint(0, 0xFFFFFFFF)
         dut.data_in.value = reg_data
         for offset in range(4):
             dut.address.value = word | offset
@@ -59,4 +64,18 @@ async def ls_unit_test(dut):
                 assert dut.byte_enable.value == 0b1100
                 assert dut.data_out.value == (reg_data & 0x0000FFFF) << 16
             else:
-                assert dut.byte_enable.value == 0b0000
\ No newline at end of file
+                assert dut.byte_enable.value == 0b0000
+
+@cocotb.test()
+async def ls_vector_test(dut):
+    # Random addresses and data under every funct3, unsupported ones included
+    rng = np.random.default_rng(0)
+    inputs = {
+        "address": random_words(rng, VECTORS),
+        "f3": random_words(rng, VECTORS, 3),
+        "data_in": random_words(rng, VECTORS),
+    }
+    got = await drive(dut, inputs, ("byte_enable", "data_out"))
+    byte_enable, data_out, data_out_mask = load_store_model(*inputs.values())
+    check("byte_enable", got["byte_enable"], byte_enable, inputs)
+    check("data_out", got["data_out"], data_out, inputs, data_out_mask)
@@ -0,0 +1,227 @@
+# PROGRAM LOADER
+#
+# Turns ELF32 RISC-V executables, Intel-HEX files and the plain $readmemh
+# images used in tb/test_cpu into one word array per memory region.
+#
+# Decoded images are cached on disk as raw little-endian word arrays keyed
+# by a hash of the program and of the memory map, so loading the same
+# program again only costs an mmap. The cache is under VHC_IMAGE_CACHE,
+# target/images next to this file's directory by default, like the codec
+# cache of typegen.py. Where it can't be written, images aren't cached.
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from mem_config import TEST_MEMORY_MAP
+from utils import parse_hex
+
+EM_RISCV = 243
+PT_LOAD = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "target", "images")
+
+
+def parse_elf(data):
+    # Returns the PT_LOAD segments of an ELF32 little-endian RISC-V executable
+    # as a list of (address, bytes). .bss style segments are zero-filled.
+    if data[:4] != b"\x7fELF":
+        raise ValueError("Not an ELF file")
+    if data[4] != 1 or data[5] != 1:
+        raise ValueError("Only ELF32 little-endian executables are supported")
+
+    (e_machine,) = struct.unpack_from("<H", data, 18)
+    if e_machine != EM_RISCV:
+        raise ValueError(f"Not a RISC-V executable (e_machine = {e_machine})")
+
+    e_phoff, = struct.unpack_from("<I", data, 28)
+    e_phentsize, e_phnum = struct.unpack_from("<HH", data, 42)
+
+    segments = []
+    for i in range(e_phnum):
+        p_type, p_offset, _p_vaddr, p_paddr, p_filesz, p_memsz, _p_flags, _p_align = \
+            struct.unpack_from("<8I", data, e_phoff + i * e_phentsize)
+        if p_type != PT_LOAD or p_memsz == 0:
+            continue
+        contents = bytes(data[p_offset:p_offset + p_filesz]) + bytes(p_memsz - p_filesz)
+        segments.append((p_paddr, contents))
+    return segments
+
+
+def parse_ihex(text):
+    # Returns the data records of an Intel-HEX file as a list of (address, bytes),
+    # merging records that follow each other.
+    segments = []
+    base = 0
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != ":":
+            raise ValueError(f"Line {line_number}: missing start code")
+
+        record = bytes.fromhex(line[1:])
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ValueError(f"Line {line_number}: bad record length")
+        if sum(record) & 0xFF != 0:
+            raise ValueError(f"Line {line_number}: bad checksum")
+
+        count = record[0]
+        offset = (record[1] << 8) | record[2]
+        kind = record[3]
+        payload = record[4:4 + count]
+
+        if kind == 0x00:
+            address = base + offset
+            if segments and segments[-1][0] + len(segments[-1][1]) == address:
+                segments[-1][1].extend(payload)
+            else:
+                segments.append((address, bytearray(payload)))
+        elif kind == 0x01:
+            break
+        elif kind == 0x02:
+            base = int.from_bytes(payload, "big") << 4
+        elif kind == 0x04:
+            base = int.from_bytes(payload, "big") << 16
+        # 0x03 and 0x05 (start addresses) don't matter to us
+
+    return [(address, bytes(contents)) for address, contents in segments]
+
+
+def map_segments(segments, memory_map=TEST_MEMORY_MAP):
+    # Place each segment in the region containing it.
+    # Returns {region name: array of words} for every region that was touched.
+    images = {}
+    for address, contents in segments:
+        end = address + len(contents)
+        region = next((r for r in memory_map if r.contains(address)), None)
+        if region is None or end > region.end_addr:
+            raise ValueError(f"Segment 0x{address:08x}-0x{end:08x} does not fit in any memory region")
+
+        image = images.get(region.name)
+        if image is None:
+            image = bytearray(region.size)
+            images[region.name] = image
+        start = address - region.start_addr
+        image[start:start + len(contents)] = contents
+
+    return {name: _to_words(image) for name, image in images.items()}
+
+
+def load_segments(path, memory_map=TEST_MEMORY_MAP):
+    with open(path, "rb") as f:
+        data = f.read()
+    return _decode(path, data, memory_map)
+
+
+def load_program(path, memory_map=TEST_MEMORY_MAP, cache_dir=None):
+    # Load a program, going through the image cache.
+    # Returns {region name: word buffer}, ready for utils.load_words().
+    cache_dir = cache_dir or os.environ.get("VHC_IMAGE_CACHE", DEFAULT_CACHE_DIR)
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    key = _cache_key(data, memory_map)
+    names = [region.name for region in memory_map]
+    cached = {}
+    for name in names:
+        cache_file = os.path.join(cache_dir, f"{key}.{name}.bin")
+        if os.path.exists(cache_file):
+            cached[name] = _map_cached(cache_file)
+    manifest = os.path.join(cache_dir, f"{key}.regions")
+    if os.path.exists(manifest):
+        with open(manifest, encoding="UTF-8") as f:
+            expected = f.read().split()
+        if all(name in cached for name in expected):
+            return {name: cached[name] for name in expected}
+
+    images = _decode(path, data, memory_map)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, words in images.items():
+            _write_atomic(os.path.join(cache_dir, f"{key}.{name}.bin"), _words_to_le_bytes(words))
+        _write_atomic(manifest, " ".join(images).encode())
+    except OSError:
+        # Read-only cache: the decoded images are just not kept
+        pass
+
+    return images
+
+
+def write_readmemh(words, path):
+    # Write a word array in the format expected by INIT_FILE / $readmemh
+    with open(path, "w", encoding="UTF-8") as f:
+        f.writelines(f"{word:08X}\n" for word in words)
+
+
+def _decode(path, data, memory_map):
+    if data[:4] == b"\x7fELF":
+        return map_segments(parse_elf(data), memory_map)
+
+    text = data.decode("ascii")
+    if text.lstrip().startswith(":"):
+        return map_segments(parse_ihex(text), memory_map)
+
+    # Plain $readmemh image: goes at the start of the ROM
+    words = parse_hex(text)
+    return map_segments([(memory_map[0].start_addr, _words_to_le_bytes(words))], memory_map)
+
+
+def _cache_key(data, memory_map):
+    h = hashlib.sha256(data)
+    for region in memory_map:
+        h.update(f"{region.name}:{region.start_addr}:{region.size};".encode())
+    return h.hexdigest()[:32]
+
+
+def _to_words(image):
+    words = array("I")
+    words.frombytes(bytes(image))
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def _words_to_le_bytes(words):
+    words = array("I", words)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words.tobytes()
+
+
+def _map_cached(cache_file):
+    with open(cache_file, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if sys.byteorder == "big":
+        return _to_words(mapped)
+    return memoryview(mapped).cast("I")
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    # Convert a program into per-region $readmemh images usable as INIT_FILE
+    import argparse
+    from mem_config import MEMORY_MAP
+
+    parser = argparse.ArgumentParser(description="Convert an ELF/Intel-HEX program into $readmemh images")
+    parser.add_argument("program")
+    parser.add_argument("--fpga", action="store_true", help="use the FPGA memory map instead of the test one")
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    images = load_segments(args.program, MEMORY_MAP if args.fpga else TEST_MEMORY_MAP)
+    for name, words in images.items():
+        out = os.path.join(args.out_dir, f"{name}.hex")
+        write_readmemh(words, out)
+        print(f"{name}: {len(words)} words -> {out}")
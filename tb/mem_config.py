@@ -0,0 +1,38 @@
+# Python mirror of the MemRegion packages in src/memory/mem_region.veryl
+# and src/tests/common/test_mem_config.veryl.
+# Keep these in sync with the RTL.
+
+class MemRegion:
+    def __init__(self, name, start_addr, size, writeable):
+        self.name = name
+        self.start_addr = start_addr
+        self.size = size
+        self.writeable = writeable
+
+    @property
+    def end_addr(self):
+        return self.start_addr + self.size
+
+    @property
+    def depth(self):
+        # Number of 32-bit words in the region
+        return self.size // 4
+
+    def contains(self, address):
+        return self.start_addr <= address < self.end_addr
+
+    def __repr__(self):
+        return f"MemRegion({self.name}, 0x{self.start_addr:08x}, {self.size})"
+
+
+ROM_CONFIG = MemRegion("rom", 0x00000000, 1024, False)
+RAM_CONFIG = MemRegion("ram", 0x10000000, 1024, True)
+PERIPH_BUS_CONFIG = MemRegion("periph", 0x80000000, 1024, True)
+
+TEST_ROM_CONFIG = MemRegion("rom", 0x00000000, 1024, False)
+TEST_RAM_CONFIG = MemRegion("ram", 0x00000400, 1024, True)
+TEST_PERIPH_BUS_CONFIG = MemRegion("periph", 0x80000000, 1024, True)
+
+# (rom, ram, periph), in the same order as the Soc generic parameters
+MEMORY_MAP = (ROM_CONFIG, RAM_CONFIG, PERIPH_BUS_CONFIG)
+TEST_MEMORY_MAP = (TEST_ROM_CONFIG, TEST_RAM_CONFIG, TEST_PERIPH_BUS_CONFIG)
@@ -6,9 +6,10 @@
 
 
 import cocotb
-from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge
 
+from clocking import start_clock
+
 @cocotb.coroutine
 async def reset(dut):
     dut.rst_n.value = 0
@@ -33,7 +34,7 @@ def assert_read(dut, address, expected):
 @cocotb.test()
 async def memory_data_test(dut):
     # INIT MEMORY
-    cocotb.start_soon(Clock(dut.clk, 1, units="ns").start())
+    start_clock(dut.clk)
     await reset(dut)
         
     # Test: Write and read back data
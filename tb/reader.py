@@ -1,37 +1,43 @@
 import cocotb
 from cocotb.triggers import Timer
-import random
+import numpy as np
 
-# 100 random test per mask
+from stimulus import random_test
+from vectors import check, drive, random_choice, random_words, reader_model
 
-@cocotb.test()
-async def reader_lw_test(dut):
+VECTORS = 200_000
+
+# 100 random test per mask by default, see stimulus.py
+
+@random_test(100)
+async def reader_lw_test(dut, stimulus):
     # LW TEST CASE
     dut.f3.value = 0b010
     await Timer(1, units="ns")
     dut.be_mask.value = 0b1111
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == mem_data 
 
 
-@cocotb.test()
-async def reader_invalid_test(dut):
+@random_test(1)
+async def reader_invalid_test(dut, stimulus):
     dut.f3.value = 0b001
-    dut.mem_data.value = random.randint(0,0xFFFFFFFF)
-    for i in range(16):
-        dut.be_mask.value = i
-        await Timer(1, units="ns")
-        if i == 0 :
-            assert dut.valid.value == 0
-        else :
-            assert dut.valid.value == 1
-
-@cocotb.test()
-async def reader_lh_test(dut):
+    for rng in stimulus:
+        dut.mem_data.value = rng.randint(0,0xFFFFFFFF)
+        for i in range(16):
+            dut.be_mask.value = i
+            await Timer(1, units="ns")
+            if i == 0 :
+                assert dut.valid.value == 0
+            else :
+                assert dut.valid.value == 1
+
+@random_test(100)
+async def reader_lh_test(dut, stimulus):
     # LH TEST CASE
     dut.f3.value = 0b001
 
@@ -39,16 +45,16 @@ async def reader_lh_test(dut):
 
     dut.be_mask.value = 0b1100
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
-        mem_data = random.randint(0,0x7FFFFFFF)
+        mem_data = rng.randint(0,0x7FFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0xFFFF0000) >> 16
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x80000000,0xFFFFFFFF)
+        mem_data = rng.randint(0x80000000,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         expected = ((mem_data & 0xFFFF0000) >> 16) - (1 << 16)
         await Timer(1, units="ns")
@@ -57,17 +63,17 @@ async def reader_lh_test(dut):
 
     dut.be_mask.value = 0b0011
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
         # Add a random AEAE to check if they are ignored
-        mem_data = random.randint(0,0x00007FFF) | 0xAEAE0000 
+        mem_data = rng.randint(0,0x00007FFF) | 0xAEAE0000 
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x0000FFFF)
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x00008000,0x0000FFFF) | 0xAEAE0000
+        mem_data = rng.randint(0x00008000,0x0000FFFF) | 0xAEAE0000
         dut.mem_data.value = mem_data
         expected = (mem_data & 0x0000FFFF) - (1 << 16)
         await Timer(1, units="ns")
@@ -81,8 +87,8 @@ async def reader_lh_test(dut):
 
     dut.be_mask.value = 0b1100
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0xFFFF0000) >> 16
@@ -90,15 +96,15 @@ async def reader_lh_test(dut):
 
     dut.be_mask.value = 0b0011
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x0000FFFF)
         assert dut.valid.value == 1
 
-@cocotb.test()
-async def reader_lb_test(dut):
+@random_test(100)
+async def reader_lb_test(dut, stimulus):
     # LB TEST CASE
     dut.f3.value = 0b000
 
@@ -106,16 +112,16 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b1000
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
-        mem_data = random.randint(0,0x7FFFFFFF)
+        mem_data = rng.randint(0,0x7FFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0xFF000000) >> 24
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x80000000,0xFFFFFFFF)
+        mem_data = rng.randint(0x80000000,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         expected = ((mem_data & 0xFF000000) >> 24) - (1 << 8)
         await Timer(1, units="ns")
@@ -124,16 +130,16 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0100
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
-        mem_data = random.randint(0,0x007FFFFF) | 0xAE000000
+        mem_data = rng.randint(0,0x007FFFFF) | 0xAE000000
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x00FF0000) >> 16
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x00800000,0x00FFFFFF) | 0xAE000000
+        mem_data = rng.randint(0x00800000,0x00FFFFFF) | 0xAE000000
         dut.mem_data.value = mem_data
         expected = ((mem_data & 0x00FF0000) >> 16) - (1 << 8)
         await Timer(1, units="ns")
@@ -142,16 +148,16 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0010
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
-        mem_data = random.randint(0,0x00007FFF) | 0xAEAE0000
+        mem_data = rng.randint(0,0x00007FFF) | 0xAEAE0000
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x0000FF00) >> 8
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x00008000,0x0000FFFF) | 0xAEAE0000
+        mem_data = rng.randint(0x00008000,0x0000FFFF) | 0xAEAE0000
         dut.mem_data.value = mem_data
         expected = ((mem_data & 0x0000FF00) >> 8) - (1 << 8)
         await Timer(1, units="ns")
@@ -160,16 +166,16 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0001
     await Timer(1, units="ns")
-    for _ in range(100):
+    for rng in stimulus:
         # UNSIGNED
-        mem_data = random.randint(0,0x0000007F) | 0xAEAEAE00
+        mem_data = rng.randint(0,0x0000007F) | 0xAEAEAE00
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x000000FF)
         assert dut.valid.value == 1
 
         # SIGNED
-        mem_data = random.randint(0x00000080,0x000000FF) | 0xAEAEAE00
+        mem_data = rng.randint(0x00000080,0x000000FF) | 0xAEAEAE00
         dut.mem_data.value = mem_data
         expected = (mem_data & 0x000000FF) - (1 << 8)
         await Timer(1, units="ns")
@@ -183,8 +189,8 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b1000
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0xFF000000) >> 24
@@ -192,8 +198,8 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0100
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x00FF0000) >> 16
@@ -201,8 +207,8 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0010
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x0000FF00) >> 8
@@ -210,9 +216,27 @@ async def reader_lb_test(dut):
 
     dut.be_mask.value = 0b0001
     await Timer(1, units="ns")
-    for _ in range(100):
-        mem_data = random.randint(0,0xFFFFFFFF)
+    for rng in stimulus:
+        mem_data = rng.randint(0,0xFFFFFFFF)
         dut.mem_data.value = mem_data
         await Timer(1, units="ns")
         assert dut.wb_data.value == (mem_data & 0x000000FF)
-        assert dut.valid.value == 1
\ No newline at end of file
+        assert dut.valid.value == 1
+
+@cocotb.test()
+async def reader_vector_test(dut):
+    # Random data under every funct3 and byte enable mask, weighted towards
+    # the masks loads actually produce
+    rng = np.random.default_rng(0)
+    be_mask = random_words(rng, VECTORS, 4)
+    load_masks = rng.random(VECTORS) < 0.75
+    be_mask[load_masks] = random_choice(rng, int(load_masks.sum()), (0b0001, 0b0010, 0b0100, 0b1000, 0b0011, 0b1100, 0b1111))
+    inputs = {
+        "mem_data": random_words(rng, VECTORS),
+        "be_mask": be_mask,
+        "f3": random_words(rng, VECTORS, 3),
+    }
+    got = await drive(dut, inputs, ("wb_data", "valid"))
+    wb_data, valid = reader_model(*inputs.values())
+    check("wb_data", got["wb_data"], wb_data, inputs)
+    check("valid", got["valid"], valid, inputs)
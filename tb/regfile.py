@@ -1,12 +1,18 @@
 import cocotb
-from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
-import random
+import numpy as np
 
-@cocotb.test()
-async def regfile_test(dut):
+from backdoor import backdoor
+from clocking import start_clock
+from regfile_agent import RegfileAgent, RegfileScoreboard, random_batches
+from stimulus import random_test
+
+OPERATIONS = 200_000
+
+@random_test(1000, stateful=True)
+async def regfile_test(dut, stimulus):
     # Start a 10 ns clock
-    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    start_clock(dut.clk, 10)
     await RisingEdge(dut.clk)
 
     # Init and reset
@@ -25,12 +31,12 @@ async def regfile_test(dut):
     theorical_regs = [0 for _ in range(32)]
 
     # Loop to write and read random values, 1000 test shall be enough
-    for _ in range(1000):
+    for rng in stimulus:
         # Generate a random register address (1 to 31, skip 0)
-        read_address1 = random.randint(1, 31)
-        read_address2 = random.randint(1, 31)
-        write_address = random.randint(1, 31)
-        write_value = random.randint(0, 0xFFFFFFFF)
+        read_address1 = rng.randint(1, 31)
+        read_address2 = rng.randint(1, 31)
+        write_address = rng.randint(1, 31)
+        write_value = rng.randint(0, 0xFFFFFFFF)
 
         # perform reads
         await Timer(1, units="ns") # wait a ns to test async read
@@ -74,3 +80,21 @@ async def regfile_test(dut):
     assert int(dut.read_ports[0].data.value) == 0
 
     print("Random write/read test completed successfully.")
+
+
+@cocotb.test()
+async def regfile_agent_test(dut):
+    # One write and two reads every clock, checked against the shadow registers
+    start_clock(dut.clk, 10)
+    await RisingEdge(dut.clk)
+    dut.rst.value = 1
+
+    agent = RegfileAgent(dut.write_port, dut.read_ports, dut.clk)
+    # Start from whatever the previous tests left in the registers
+    scoreboard = RegfileScoreboard(backdoor(dut.regfile.mem.mem).read())
+
+    rng = np.random.default_rng(0)
+    for batch in random_batches(rng, OPERATIONS):
+        scoreboard.check(batch, await agent.run(batch))
+
+    dut._log.info(f"{scoreboard.operations} operations checked")
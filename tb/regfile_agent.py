@@ -0,0 +1,135 @@
+# REGFILE AGENT
+#
+# Drives the Regfile with one write and two reads every clock cycle from
+# batches of NumPy arrays, and checks the reads against a shadow copy of the
+# registers:
+# - cycle i: the write and both read addresses are applied after rising
+#   edge i, the reads are sampled at the falling edge, and the write lands
+#   on rising edge i + 1
+# - a read sees every write of the previous cycles but not the one of its
+#   own cycle (read-during-write returns the old value)
+# - x0 reads as 0, whatever was written to it
+#
+#   agent = RegfileAgent(dut.write_port, dut.read_ports, dut.clk)
+#   scoreboard = RegfileScoreboard()
+#   for batch in random_batches(rng, operations):
+#       scoreboard.check(batch, await agent.run(batch))
+
+import numpy as np
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from vectors import check, random_words
+
+BATCH_SIZE = 1 << 16
+
+# Fields of a batch, all arrays of the batch length
+BATCH_FIELDS = ("write_enable", "write_address", "write_data", "read_address0", "read_address1")
+
+
+def random_batch(rng, n):
+    # Random operations, biased towards the interesting cases: some writes
+    # to x0, and reads of the register being written in the same cycle
+    write_address = random_words(rng, n, 5)
+    batch = {
+        "write_enable": (rng.random(n) < 0.8).astype(np.uint32),
+        "write_address": write_address,
+        "write_data": random_words(rng, n),
+        "read_address0": random_words(rng, n, 5),
+        "read_address1": random_words(rng, n, 5),
+    }
+    for port in ("read_address0", "read_address1"):
+        same = rng.random(n) < 0.25
+        batch[port][same] = write_address[same]
+    return batch
+
+
+def random_batches(rng, operations, batch_size=BATCH_SIZE):
+    while operations > 0:
+        n = min(operations, batch_size)
+        yield random_batch(rng, n)
+        operations -= n
+
+
+class RegfileAgent:
+    def __init__(self, write_port, read_ports, clk):
+        self.write_port = write_port
+        self.read_ports = read_ports
+        self.clk = clk
+
+    async def run(self, batch):
+        # Apply a batch, one operation per clock. Returns the data read on
+        # both ports, as arrays.
+        write = self.write_port
+        handles = (
+            write.write_enable,
+            write.address,
+            write.data,
+            self.read_ports[0].address,
+            self.read_ports[1].address,
+        )
+        columns = [batch[field].tolist() for field in BATCH_FIELDS]
+        current = [None] * len(handles)
+        read_data0 = self.read_ports[0].data
+        read_data1 = self.read_ports[1].data
+
+        n = len(columns[0])
+        read0 = [0] * n
+        read1 = [0] * n
+        falling = FallingEdge(self.clk)
+        rising = RisingEdge(self.clk)
+
+        for i in range(n):
+            for j, handle in enumerate(handles):
+                value = columns[j][i]
+                if value != current[j]:
+                    handle.value = current[j] = value
+            await falling
+            read0[i] = int(read_data0.value)
+            read1[i] = int(read_data1.value)
+            await rising
+
+        write.write_enable.value = 0
+        return np.array(read0, dtype=np.uint32), np.array(read1, dtype=np.uint32)
+
+
+class RegfileScoreboard:
+    def __init__(self, registers=None):
+        # Register values before the next batch, all 0 unless given
+        self.shadow = np.zeros(32, dtype=np.uint32)
+        if registers is not None:
+            self.shadow[1:] = np.asarray(registers, dtype=np.uint32)[1:32]
+        self.operations = 0
+
+    def expected(self, batch):
+        # Expected data on both read ports, and the register values after
+        # the batch. For every register, the last write before each cycle
+        # is found with a running maximum over the cycle indices.
+        n = len(batch["write_enable"])
+        cycles = np.arange(n)
+        written = (batch["write_enable"] != 0) & (batch["write_address"] != 0)
+        write_data = batch["write_data"]
+
+        expected0 = np.zeros(n, dtype=np.uint32)
+        expected1 = np.zeros(n, dtype=np.uint32)
+        shadow = self.shadow.copy()
+        for reg in range(1, 32):
+            last_write = np.maximum.accumulate(np.where(written & (batch["write_address"] == reg), cycles, -1))
+            # Reads only see the writes of earlier cycles
+            previous_write = np.concatenate(([-1], last_write[:-1]))
+            values = np.where(previous_write >= 0, write_data[np.maximum(previous_write, 0)], shadow[reg])
+
+            for port, expected in (("read_address0", expected0), ("read_address1", expected1)):
+                reads = batch[port] == reg
+                expected[reads] = values[reads]
+
+            if n and last_write[-1] >= 0:
+                shadow[reg] = write_data[last_write[-1]]
+        return expected0, expected1, shadow
+
+    def check(self, batch, read_data):
+        expected0, expected1, shadow = self.expected(batch)
+        inputs = {field: batch[field] for field in BATCH_FIELDS}
+        check("read_ports[0].data", read_data[0], expected0, inputs)
+        check("read_ports[1].data", read_data[1], expected1, inputs)
+        self.shadow = shadow
+        self.operations += len(expected0)
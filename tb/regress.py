@@ -0,0 +1,311 @@
+# PARALLEL TEST RUNNER
+#
+# Runs the `veryl test` suites of src/tests/test_*.veryl side by side: each
+# suite gets its own copy of the project in a work directory (veryl test
+# writes its build and simulation files inside the project), and the suites
+# run as separate processes, as many at a time as there are cores. A full
+# regression then takes about as long as the slowest suite.
+#
+# Usage:
+#   python tb/regress.py [-j JOBS] [--wave] [--keep] [--all] [suite ...]
+#
+# Suites are named after their file, e.g. `alu` for src/tests/test_alu.veryl;
+# all of them run by default. Logs and report.json go to target/regress.
+#
+# Suites are skipped when none of their inputs (see deps.py) changed since
+# they last passed with the same settings (TB_SEED and co., --wave), as
+# recorded in target/regress/passed.json; --all runs them anyway.
+#
+# The tests' timings (see telemetry.py) are recorded with the git revision
+# in target/telemetry.sqlite, unless --no-telemetry is given.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import telemetry
+from deps import REPO, Graph, discover, source_files
+
+REPORT_DIR = os.path.join(REPO, "target", "regress")
+# Input hash of every suite at its last passing run
+PASSED_FILE = os.path.join(REPORT_DIR, "passed.json")
+# Environment changing what the tests do (see stimulus.py)
+RUN_SETTINGS = ("TB_SEED", "TB_ITERATIONS", "TB_SHARD", "TB_REPLAY", "TESTCASE")
+
+# Copied into each work directory
+PROJECT_FILES = ("Veryl.toml", "Veryl.lock", "src", "tb")
+
+# cocotb's summary line, e.g. "** TESTS=4 PASS=4 FAIL=0 SKIP=0"
+_COCOTB_SUMMARY = re.compile(r"TESTS=(\d+)\s+PASS=(\d+)\s+FAIL=(\d+)(?:\s+SKIP=(\d+))?")
+
+
+def make_workdir(base, suite, repo=REPO, name=None):
+    # Copy of the project for one suite, in base/<name or suite name>. Path
+    # dependencies are relative to the project, so they're made absolute.
+    workdir = os.path.join(base, name or suite.name)
+    for entry in PROJECT_FILES:
+        source = os.path.join(repo, entry)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(workdir, entry), ignore=shutil.ignore_patterns("__pycache__"))
+        elif os.path.exists(source):
+            os.makedirs(workdir, exist_ok=True)
+            shutil.copy2(source, workdir)
+
+    for name in ("Veryl.toml", "Veryl.lock"):
+        path = os.path.join(workdir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="UTF-8") as f:
+            text = f.read()
+        text = re.sub(
+            r'((?:path|source)\s*=\s*")(\.\.?/[^"]*)"',
+            lambda m: f'{m.group(1)}{os.path.normpath(os.path.join(repo, m.group(2)))}"',
+            text,
+        )
+        with open(path, "w", encoding="UTF-8") as f:
+            f.write(text)
+    return workdir
+
+
+def parse_summary(output):
+    # (tests, passed, failed) from the cocotb summaries in a log, or None
+    counts = None
+    for match in _COCOTB_SUMMARY.finditer(output):
+        tests, passed, failed = (int(match.group(i)) for i in (1, 2, 3))
+        counts = tuple(a + b for a, b in zip(counts or (0, 0, 0), (tests, passed, failed)))
+    return counts
+
+
+def sim_name(suite, toplevel):
+    # veryl test of a suite simulating `toplevel`, as named in #[test(...)]
+    matches = [(len(top), name) for name, top in suite.tests if (toplevel or "").lower().endswith(top.lower())]
+    return max(matches)[1] if matches else None
+
+
+def collect_telemetry(suite, workdir):
+    # Records of the suite's tests, with waveform bytes shared out among the
+    # tests of each simulation in proportion to their simulated time
+    records = telemetry.load_records(os.path.join(workdir, "target", "telemetry"))
+    for record in records:
+        record["sim"] = sim_name(suite, record.get("toplevel"))
+
+    waveforms = os.path.join(workdir, "target", "waveform")
+    if os.path.isdir(waveforms):
+        sizes = {}
+        for entry in os.listdir(waveforms):
+            stem = entry.split(".")[0].lower()
+            for name, top in suite.tests:
+                if stem in (name.lower(), top.lower()):
+                    sizes[name] = sizes.get(name, 0) + os.path.getsize(os.path.join(waveforms, entry))
+        for name, size in sizes.items():
+            tests = [r for r in records if r["sim"] == name]
+            sim_ns = sum(r["sim_ns"] for r in tests)
+            for record in tests:
+                record["waveform_bytes"] = round(size * record["sim_ns"] / sim_ns) if sim_ns else size // len(tests)
+    return records
+
+
+def run_suite(suite, base, wave=False, timeout=None, env=None, name=None):
+    # Build and run one suite in its own work directory, returns its result.
+    # `name` tells apart several runs of a suite, in the work directory and
+    # log names.
+    start = time.monotonic()
+    name = name or suite.name
+    result = {"suite": suite.name, "tests": [test for test, _ in suite.tests]}
+    try:
+        workdir = make_workdir(base, suite, name=name)
+        env = telemetry.simulation_env(os.environ if env is None else env,
+                                       os.path.join(workdir, "target", "telemetry"), os.path.join(workdir, "tb"))
+        command = ["veryl", "test", suite.path] + source_files(workdir) + (["--wave"] if wave else []) + ["--quiet"]
+        process = subprocess.run(
+            command,
+            cwd=workdir,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            timeout=timeout,
+        )
+        output = process.stdout
+        status = "passed" if process.returncode == 0 else "failed"
+        waveforms = os.path.join(workdir, "target", "waveform")
+        if wave and os.path.isdir(waveforms):
+            shutil.copytree(waveforms, os.path.join(REPO, "target", "waveform"), dirs_exist_ok=True)
+        result["telemetry"] = collect_telemetry(suite, workdir)
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout or ""
+        if isinstance(output, bytes):
+            output = output.decode(errors="replace")
+        status = "timeout"
+    except OSError as e:
+        output = str(e)
+        status = "error"
+
+    result["status"] = status
+    result["seconds"] = round(time.monotonic() - start, 3)
+    counts = parse_summary(output)
+    if counts is not None:
+        result["cocotb"] = dict(zip(("tests", "passed", "failed"), counts))
+
+    log = os.path.join(REPORT_DIR, f"{name}.log")
+    os.makedirs(os.path.dirname(log), exist_ok=True)
+    with open(log, "w", encoding="UTF-8") as f:
+        f.write(output)
+    result["log"] = os.path.relpath(log, REPO)
+    return result
+
+
+def run_key(inputs_hash, wave=False, env=None):
+    # What passed.json records for a passing run: the hash of the suite's
+    # inputs, and of the settings it ran with. A replay, another seed or a
+    # run with waveforms then neither skips nor stands for a plain run.
+    env = os.environ if env is None else env
+    settings = {name: env.get(name, "") for name in RUN_SETTINGS}
+    settings["wave"] = bool(wave)
+    return hashlib.sha256((inputs_hash + json.dumps(settings, sort_keys=True)).encode()).hexdigest()
+
+
+def load_passed():
+    try:
+        with open(PASSED_FILE, "r", encoding="UTF-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_passed(passed):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(PASSED_FILE, "w", encoding="UTF-8") as f:
+        json.dump(passed, f, indent=2, sort_keys=True)
+
+
+def skipped_result(suite):
+    return {"suite": suite.name, "tests": [name for name, _ in suite.tests], "status": "skipped", "seconds": 0.0}
+
+
+def run(suites, jobs=None, wave=False, timeout=None, keep=False, on_result=None):
+    # Run suites in parallel, returns the report
+    jobs = jobs or os.cpu_count() or 1
+    base = tempfile.mkdtemp(prefix="vhc_regress_")
+    start = time.monotonic()
+    results = []
+    try:
+        # Each suite is a separate `veryl test` process, threads only wait on them
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_suite, suite, base, wave, timeout) for suite in suites]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+    finally:
+        if keep:
+            print(f"Work directories kept in {base}", file=sys.stderr)
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+
+    results.sort(key=lambda r: r["suite"])
+    return {
+        "jobs": jobs,
+        "seconds": round(time.monotonic() - start, 3),
+        "passed": all(r["status"] in ("passed", "skipped") for r in results),
+        "suites": results,
+    }
+
+
+def format_result(result):
+    line = f"{result['status'].upper():8} {result['suite']:24} {result['seconds']:9.1f} s"
+    if "cocotb" in result:
+        c = result["cocotb"]
+        line += f"   {c['passed']}/{c['tests']} tests passed"
+    if result["status"] not in ("passed", "skipped"):
+        line += f"   see {result['log']}"
+    return line
+
+
+def format_report(report):
+    suites = report["suites"]
+    total = sum(r["seconds"] for r in suites)
+    failed = [r["suite"] for r in suites if r["status"] not in ("passed", "skipped")]
+    skipped = [r["suite"] for r in suites if r["status"] == "skipped"]
+    lines = [format_result(r) for r in sorted(suites, key=lambda r: -r["seconds"])]
+    lines.append("")
+    lines.append(f"{len(suites) - len(failed)}/{len(suites)} suites passed in {report['seconds']:.1f} s "
+                 f"on {report['jobs']} jobs ({total:.1f} s of suite time)")
+    if skipped:
+        lines.append(f"Unchanged since they last passed: {', '.join(skipped)}")
+    if failed:
+        lines.append("Failed: " + ", ".join(failed))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the veryl test suites in parallel")
+    parser.add_argument("suites", nargs="*", help="suites to run (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, help="parallel suites (default: core count)")
+    parser.add_argument("--wave", action="store_true", help="dump waveforms")
+    parser.add_argument("--timeout", type=float, help="per-suite timeout in seconds")
+    parser.add_argument("--keep", action="store_true", help="keep the work directories")
+    parser.add_argument("--all", action="store_true", help="run suites even if unchanged since they last passed")
+    parser.add_argument("--no-telemetry", action="store_true", help="don't record the timings")
+    parser.add_argument("--list", action="store_true", help="list the suites and exit")
+    args = parser.parse_args(argv)
+
+    suites = discover()
+    if args.list:
+        for suite in suites:
+            print(f"{suite.name:24} {', '.join(name for name, _ in suite.tests)}")
+        return 0
+
+    if args.suites:
+        known = {suite.name: suite for suite in suites}
+        unknown = [name for name in args.suites if name not in known]
+        if unknown:
+            parser.error(f"unknown suites: {', '.join(unknown)}")
+        suites = [known[name] for name in args.suites]
+
+    revision = telemetry.git_revision(REPO)
+    # Hashed before running, so that edits made meanwhile trigger a new run
+    graph = Graph()
+    hashes = {suite.name: run_key(graph.suite_hash(suite), args.wave) for suite in suites}
+    passed = load_passed()
+    skipped = [] if args.all else [suite for suite in suites if passed.get(suite.name) == hashes[suite.name]]
+    for suite in skipped:
+        print(format_result(skipped_result(suite)), flush=True)
+
+    pending = [suite for suite in suites if suite not in skipped]
+    report = run(pending, args.jobs, args.wave, args.timeout, args.keep, on_result=lambda r: print(format_result(r), flush=True))
+    report["suites"] = sorted(report["suites"] + [skipped_result(suite) for suite in skipped], key=lambda r: r["suite"])
+
+    for result in report["suites"]:
+        if result["status"] == "passed":
+            passed[result["suite"]] = hashes[result["suite"]]
+        elif result["status"] != "skipped":
+            passed.pop(result["suite"], None)
+    save_passed(passed)
+
+    if not args.no_telemetry:
+        db = telemetry.connect()
+        for result in report["suites"]:
+            if result.get("telemetry"):
+                telemetry.store(db, revision, result["suite"], result["telemetry"])
+        db.close()
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, "report.json"), "w", encoding="UTF-8") as f:
+        json.dump(report, f, indent=2)
+    print()
+    print(format_report(report))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
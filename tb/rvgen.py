@@ -0,0 +1,236 @@
+# RANDOM RV32I PROGRAM GENERATOR
+#
+# Produces constrained-random instruction streams lazily, so programs of any
+# length can be checked against the reference model without being stored.
+#
+# Register usage:
+# - x31 always holds the start of the RAM region (base of every load/store)
+# - x30 is the scratch register used to build jalr targets
+# - every other register is fair game
+#
+# Branches and jumps only ever go forward, a bounded number of instructions
+# ahead, so every program terminates. Finite programs end with a run of
+# `j .` so that a jump near the end still lands on the final self-loop.
+
+import random
+
+from mem_config import TEST_ROM_CONFIG, TEST_RAM_CONFIG
+
+BASE_REG = 31
+SCRATCH_REG = 30
+
+# Relative weights of each instruction class. Branches and jumps are
+# controlled separately through `branch_density`.
+DEFAULT_MIX = {
+    "alu": 4,
+    "alu_imm": 4,
+    "shift_imm": 1,
+    "load": 2,
+    "store": 2,
+    "rom_load": 0.5,
+    "upper": 1,
+}
+
+# Longest forward jump, in instructions
+MAX_SKIP = 8
+
+
+def encode_r(rd, f3, rs1, rs2, f7=0):
+    return (f7 << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | 0b0110011
+
+
+def encode_i(op, rd, f3, rs1, imm):
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (f3 << 12) | (rd << 7) | op
+
+
+def encode_s(f3, rs1, rs2, imm):
+    imm &= 0xFFF
+    return ((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12) | ((imm & 0x1F) << 7) | 0b0100011
+
+
+def encode_b(f3, rs1, rs2, imm):
+    imm &= 0x1FFF
+    return (
+        ((imm >> 12) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15) | (f3 << 12)
+        | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 1) << 7) | 0b1100011
+    )
+
+
+def encode_u(op, rd, imm):
+    return (imm & 0xFFFFF000) | (rd << 7) | op
+
+
+def encode_j(rd, imm):
+    imm &= 0x1FFFFF
+    return (
+        ((imm >> 20) << 31) | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 11) & 1) << 20)
+        | (((imm >> 12) & 0xFF) << 12) | (rd << 7) | 0b1101111
+    )
+
+
+NOP = encode_i(0b0010011, 0, 0, 0, 0)
+SELF_JUMP = encode_j(0, 0)
+
+
+def load_address(rd, region):
+    # lui + addi pair loading the start address of `region` in `rd`
+    upper = (region.start_addr + 0x800) & 0xFFFFF000
+    lower = (region.start_addr - upper) & 0xFFF
+    return [encode_u(0b0110111, rd, upper), encode_i(0b0010011, rd, 0, rd, lower)]
+
+
+class RandomProgram:
+    def __init__(
+        self,
+        seed=None,
+        mix=None,
+        reuse=0.3,
+        branch_density=0.1,
+        misaligned=0.05,
+        rom=TEST_ROM_CONFIG,
+        ram=TEST_RAM_CONFIG,
+    ):
+        self.rng = random.Random(seed)
+        self.mix = dict(DEFAULT_MIX if mix is None else mix)
+        # Probability that a source register is the last destination register,
+        # which exercises WB -> EXEC forwarding in WritebackMux
+        self.reuse = reuse
+        # Probability that an instruction is a branch or a jump
+        self.branch_density = branch_density
+        # Probability that a load or store is misaligned (and dropped by the core)
+        self.misaligned = misaligned
+        self.rom = rom
+        self.ram = ram
+
+        # ROM loads use x0 as base, which only reaches a ROM mapped at 0
+        if rom.start_addr != 0 or rom.size > 2048:
+            self.mix.pop("rom_load", None)
+
+        self._classes = list(self.mix)
+        self._weights = [self.mix[c] for c in self._classes]
+        self._last_rd = 1
+
+    # -- Whole programs --
+
+    def data(self):
+        # Random initial contents for the RAM region
+        rng = self.rng
+        return [rng.getrandbits(32) for _ in range(self.ram.depth)]
+
+    def prologue(self):
+        # Point x31 at the RAM and load the other registers from it
+        words = load_address(BASE_REG, self.ram)
+        for rd in range(1, BASE_REG):
+            words.append(encode_i(0b0000011, rd, 0b010, BASE_REG, 4 * rd))
+        return words
+
+    def epilogue(self):
+        return [SELF_JUMP] * (MAX_SKIP + 1)
+
+    def program(self, length):
+        # A complete program: prologue, `length` random instructions, epilogue
+        words = self.prologue()
+        stream = self.instructions()
+        words.extend(next(stream) for _ in range(length))
+        words.extend(self.epilogue())
+        return words
+
+    def fill(self, depth):
+        # A complete program that fills a memory of `depth` words
+        length = depth - len(self.prologue()) - len(self.epilogue())
+        return self.program(length)
+
+    # -- Instruction stream --
+
+    def instructions(self):
+        # Endless generator of random instructions
+        rng = self.rng
+        # Instruction indexes that an earlier branch or jump may land on
+        self._index = 0
+        self._targets = set()
+        while True:
+            if rng.random() < self.branch_density:
+                words = self._control_flow()
+            else:
+                cls = rng.choices(self._classes, self._weights)[0]
+                words = (getattr(self, "_gen_" + cls)(),)
+            for word in words:
+                yield word
+                self._targets.discard(self._index)
+                self._index += 1
+
+    def _rd(self):
+        rd = self.rng.randint(1, SCRATCH_REG - 1)
+        self._last_rd = rd
+        return rd
+
+    def _rs(self):
+        if self.rng.random() < self.reuse:
+            return self._last_rd
+        return self.rng.randint(0, SCRATCH_REG - 1)
+
+    def _gen_alu(self):
+        rng = self.rng
+        f3 = rng.randrange(8)
+        rs1, rs2 = self._rs(), self._rs()
+        if f3 == 0b000 or f3 == 0b101:
+            f7 = rng.choice((0b0000000, 0b0100000))
+        else:
+            f7 = 0
+        return encode_r(self._rd(), f3, rs1, rs2, f7)
+
+    def _gen_alu_imm(self):
+        rng = self.rng
+        f3 = rng.choice((0b000, 0b010, 0b011, 0b100, 0b110, 0b111))
+        return encode_i(0b0010011, self._rd(), f3, self._rs(), rng.randint(-2048, 2047))
+
+    def _gen_shift_imm(self):
+        rng = self.rng
+        f3 = rng.choice((0b001, 0b101))
+        f7 = 0b0100000 if f3 == 0b101 and rng.random() < 0.5 else 0
+        return encode_i(0b0010011, self._rd(), f3, self._rs(), (f7 << 5) | rng.randrange(32))
+
+    def _offset(self, width, limit):
+        rng = self.rng
+        offset = rng.randrange(0, limit, width)
+        if width > 1 and rng.random() < self.misaligned:
+            offset += rng.randrange(1, width)
+        return offset
+
+    def _gen_load(self):
+        rng = self.rng
+        f3, width = rng.choice(((0b000, 1), (0b100, 1), (0b001, 2), (0b101, 2), (0b010, 4)))
+        return encode_i(0b0000011, self._rd(), f3, BASE_REG, self._offset(width, min(self.ram.size, 2048) - 3))
+
+    def _gen_rom_load(self):
+        return encode_i(0b0000011, self._rd(), 0b010, 0, self._offset(4, self.rom.size - 3))
+
+    def _gen_store(self):
+        rng = self.rng
+        f3, width = rng.choice(((0b000, 1), (0b001, 2), (0b010, 4)))
+        return encode_s(f3, BASE_REG, self._rs(), self._offset(width, min(self.ram.size, 2048) - 3))
+
+    def _gen_upper(self):
+        op = self.rng.choice((0b0110111, 0b0010111))
+        return encode_u(op, self._rd(), self.rng.getrandbits(32))
+
+    def _control_flow(self):
+        # Forward branch or jump, `skip` instructions ahead
+        rng = self.rng
+        skip = rng.randint(1, MAX_SKIP)
+        kind = rng.random()
+        if kind < 0.7:
+            f3 = rng.choice((0b000, 0b001, 0b100, 0b101, 0b110, 0b111))
+            words = (encode_b(f3, self._rs(), self._rs(), 4 * skip),)
+        elif kind < 0.85 or self._index + 1 in self._targets:
+            # A jalr that something jumps straight to would see a stale x30
+            words = (encode_j(self._rd(), 4 * skip),)
+        else:
+            # auipc x30, 0 / jalr rd, offset(x30), with offset relative to the auipc
+            skip += 1
+            words = (
+                encode_u(0b0010111, SCRATCH_REG, 0),
+                encode_i(0b1100111, self._rd(), 0b000, SCRATCH_REG, 4 * skip),
+            )
+        self._targets.add(self._index + skip)
+        return words
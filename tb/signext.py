@@ -4,6 +4,10 @@ from cocotb.triggers import RisingEdge, Timer
 import random
 import numpy as np
 
+from vectors import check, drive, random_words, signext_model
+
+VECTORS = 200_000
+
 @cocotb.test()
 async def signext_i_type_test(dut):
     # TEST POSITIVE IMM = 123 WITH SOURCE = 0
@@ -158,4 +162,15 @@ async def signext_u_type_test(dut):
         dut.raw_src.value = raw_data
         dut.imm_source.value = source
         await Timer(1, units="ns") # let it propagate ...
-        assert int(dut.immediate.value) == imm_31_12 << 12
\ No newline at end of file
+        assert int(dut.immediate.value) == imm_31_12 << 12
+
+@cocotb.test()
+async def signext_vector_test(dut):
+    # Random instruction bits under every immediate source, unused ones included
+    rng = np.random.default_rng(0)
+    inputs = {
+        "raw_src": random_words(rng, VECTORS, 25),
+        "imm_source": random_words(rng, VECTORS, 3),
+    }
+    got = await drive(dut, inputs, ("immediate",))
+    check("immediate", got["immediate"], signext_model(*inputs.values()), inputs)
@@ -0,0 +1,187 @@
+# SEED-SHARDED RANDOM REGRESSION
+#
+# Runs the random tests of some suites (@random_test, see stimulus.py) over
+# many seeds and iterations: each suite runs once per seed and shard, as
+# separate `veryl test` processes in parallel (see regress.py), with only
+# its random tests selected. The per-test results of all the runs are then
+# merged, and every failure is listed with the settings replaying it alone.
+#
+# Usage:
+#   python tb/soak.py [--seeds N] [--seed FIRST] [--shards M] [--iterations I] [-j JOBS] [suite ...]
+#
+# --iterations is the budget of every loop of every random test for one
+# seed, split between the shards in blocks of stimulus.BLOCK iterations;
+# tests keep their own counts without it.
+# By default all the suites with random tests run. Logs and results go to
+# target/regress/soak, the merged report to target/regress/soak.json.
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from deps import REPO, Graph, discover
+from regress import REPORT_DIR, run_suite
+
+SOAK_DIR = os.path.join(REPORT_DIR, "soak")
+
+_RANDOM_TEST = re.compile(r"^@random_test\(.*\)\s*\n\s*async\s+def\s+(\w+)", re.M)
+
+
+class Job:
+    def __init__(self, suite, tests, seed, shard, shards, iterations=None):
+        self.suite = suite
+        self.tests = tests
+        self.seed = seed
+        self.shard = f"{shard}/{shards}"
+        self.iterations = iterations
+        self.name = os.path.join("soak", f"{suite.name}-{seed}-{shard}")
+        self.results = os.path.join(REPORT_DIR, self.name)
+
+    def env(self):
+        env = dict(os.environ)
+        env.update(TB_SEED=str(self.seed), TB_SHARD=self.shard, TB_RESULTS=self.results, TESTCASE=",".join(self.tests))
+        if self.iterations is not None:
+            env["TB_ITERATIONS"] = str(self.iterations)
+        return env
+
+
+def random_tests(graph, suite):
+    # Names of the @random_test tests of a suite's testbench
+    tests = []
+    for path in sorted(graph.testbench_inputs(suite.path)):
+        with open(os.path.join(REPO, path), "r", encoding="UTF-8") as f:
+            tests += _RANDOM_TEST.findall(f.read())
+    return tests
+
+
+def load_results(job):
+    # {test: result} saved by the tests of a job
+    results = {}
+    if os.path.isdir(job.results):
+        for entry in sorted(os.listdir(job.results)):
+            if entry.endswith(".json"):
+                with open(os.path.join(job.results, entry), "r", encoding="UTF-8") as f:
+                    result = json.load(f)
+                results[result["test"]] = result
+    return results
+
+
+def replay_command(suite, result):
+    env = f"TB_SEED={result['seed']} TB_ITERATIONS={result['iterations']} TB_SHARD={result['shard']}"
+    if result.get("iteration") is not None:
+        env += f" TB_REPLAY={result['iteration']}"
+    return f"{env} TESTCASE={result['test']} python3 tb/regress.py --all {suite}"
+
+
+def merge(jobs, runs):
+    # Per test totals and failures, from the results of every job
+    tests = {}
+    for job in jobs:
+        run = runs[job.name]
+        results = load_results(job)
+        for test in job.tests:
+            merged = tests.setdefault(test, {"suite": job.suite.name, "runs": 0, "iterations": 0, "failures": []})
+            merged["runs"] += 1
+            result = results.get(test)
+            if result is None:
+                # Didn't get to save anything: build error, crash, timeout...
+                merged["failures"].append({"seed": job.seed, "shard": job.shard, "status": run["status"], "log": run["log"]})
+                continue
+            merged["iterations"] += result["completed"]
+            if result["status"] != "passed":
+                failure = {key: result.get(key) for key in ("seed", "shard", "loop", "iteration", "message")}
+                failure.update(status=result["status"], log=run["log"], replay=replay_command(job.suite.name, result))
+                merged["failures"].append(failure)
+    return tests
+
+
+def format_report(report):
+    lines = []
+    for test, merged in sorted(report["tests"].items()):
+        status = "FAILED" if merged["failures"] else "PASSED"
+        lines.append(f"{status:8} {test:24} {merged['suite']:20} {merged['iterations']:>14,} iterations in {merged['runs']} runs")
+        for failure in merged["failures"]:
+            if "iteration" in failure:
+                where = f"seed {failure['seed']}, shard {failure['shard']}"
+                if failure["iteration"] is not None:
+                    where += f", iteration {failure['iteration']} (loop {failure['loop']})"
+                lines.append(f"    {where}: {failure['message']}")
+                lines.append(f"        {failure['replay']}")
+            else:
+                lines.append(f"    seed {failure['seed']}, shard {failure['shard']}: {failure['status']}, see {failure['log']}")
+    failed = [test for test, merged in report["tests"].items() if merged["failures"]]
+    lines.append("")
+    lines.append(f"{len(report['tests']) - len(failed)}/{len(report['tests'])} random tests passed, "
+                 f"{report['jobs']} runs in {report['seconds']:.1f} s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the random tests over many seeds and shards")
+    parser.add_argument("suites", nargs="*", help="suites to run (default: all with random tests)")
+    parser.add_argument("--seeds", type=int, default=1, help="number of seeds")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--shards", type=int, default=1, help="shards per seed")
+    parser.add_argument("--iterations", type=int, help="iterations per loop and seed, over all shards")
+    parser.add_argument("-j", "--jobs", type=int, help="parallel runs (default: core count)")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    args = parser.parse_args(argv)
+
+    graph = Graph()
+    suites = {suite.name: suite for suite in discover()}
+    unknown = [name for name in args.suites if name not in suites]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+    selected = {}
+    for name in args.suites or suites:
+        tests = random_tests(graph, suites[name])
+        if tests:
+            selected[name] = tests
+        elif args.suites:
+            parser.error(f"suite {name} has no random tests")
+
+    jobs = [
+        Job(suites[name], tests, seed, shard, args.shards, args.iterations)
+        for name, tests in selected.items()
+        for seed in range(args.seed, args.seed + args.seeds)
+        for shard in range(args.shards)
+    ]
+    shutil.rmtree(SOAK_DIR, ignore_errors=True)
+
+    start = time.monotonic()
+    runs = {}
+    base = tempfile.mkdtemp(prefix="vhc_soak_")
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as pool:
+            futures = {pool.submit(run_suite, job.suite, base, False, args.timeout, job.env(), job.name): job for job in jobs}
+            for i, future in enumerate(as_completed(futures), 1):
+                job = futures[future]
+                runs[job.name] = future.result()
+                print(f"[{i}/{len(jobs)}] {job.suite.name} seed {job.seed} shard {job.shard}: {runs[job.name]['status']}", flush=True)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    report = {
+        "seeds": list(range(args.seed, args.seed + args.seeds)),
+        "shards": args.shards,
+        "iterations": args.iterations,
+        "jobs": len(jobs),
+        "seconds": round(time.monotonic() - start, 3),
+        "tests": merge(jobs, runs),
+    }
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, "soak.json"), "w", encoding="UTF-8") as f:
+        json.dump(report, f, indent=2)
+    print()
+    print(format_report(report))
+    return 1 if any(merged["failures"] for merged in report["tests"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# SEEDED RANDOM STIMULUS
+#
+# Random tests are written as loops over a Stimulus, which hands out a
+# random.Random per iteration. Seeding one costs about ten random numbers,
+# so iterations come in blocks of BLOCK sharing one, seeded from (TB_SEED,
+# test, loop, block) and drawn from in order. Shards are made of whole
+# blocks, and any iteration can be replayed by rerunning its block up to it,
+# whatever the shard or the number of iterations that came before it.
+#
+#   @random_test(1000)
+#   async def add_test(dut, stimulus):
+#       for rng in stimulus:
+#           src1 = rng.randint(0, 0xFFFFFFFF)
+#           ...
+#
+# Environment:
+# - TB_SEED:       base seed, 0 by default
+# - TB_ITERATIONS: iterations per loop, instead of the test's own count
+# - TB_SHARD:      "k/M", run the k-th of M slices of the iterations
+# - TB_REPLAY:     run this iteration of every loop, after the ones before
+#                  it in its block. Stateful tests, whose iterations depend
+#                  on the previous ones, run their shard up to it instead.
+# - TB_RESULTS:    directory where each test saves <test>-<pid>.json, with
+#                  the failing loop and iteration if any. See soak.py.
+
+import functools
+import json
+import os
+import random
+
+import cocotb
+
+# Iterations per seeded random.Random
+BLOCK = 1024
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, "") else int(value, 0)
+
+
+def parse_shard(text):
+    # "k/M" -> (k, M)
+    index, count = (int(x) for x in text.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {text}")
+    return index, count
+
+
+def shard_range(iterations, index, count):
+    # Contiguous slice of the iterations for shard `index` of `count`, made
+    # of whole blocks
+    blocks = -(-iterations // BLOCK)
+    start = blocks * index // count * BLOCK
+    end = blocks * (index + 1) // count * BLOCK
+    return range(min(start, iterations), min(end, iterations))
+
+
+class Stimulus:
+    def __init__(self, test, iterations, stateful=False):
+        self.test = test
+        self.seed = _env_int("TB_SEED", 0)
+        self.iterations = _env_int("TB_ITERATIONS", iterations)
+        self.shard = parse_shard(os.environ.get("TB_SHARD") or "0/1")
+        self.replay = _env_int("TB_REPLAY", None)
+        self.stateful = stateful
+        # Progress, for the failure report
+        self.loop = -1
+        self.iteration = None
+        self.completed = 0
+
+    def range(self):
+        iterations = shard_range(self.iterations, *self.shard)
+        if self.replay is None:
+            return iterations
+        if self.stateful:
+            return range(iterations.start, self.replay + 1)
+        return range(self.replay - self.replay % BLOCK, self.replay + 1)
+
+    def rng(self, loop, block):
+        # String seeds are hashed with SHA-512, so this doesn't depend on
+        # PYTHONHASHSEED
+        return random.Random(f"{self.seed}/{self.test}/{loop}/{block}")
+
+    def __iter__(self):
+        # Every range starts on a block boundary
+        self.loop += 1
+        rng = None
+        for i in self.range():
+            if i % BLOCK == 0:
+                rng = self.rng(self.loop, i // BLOCK)
+            self.iteration = i
+            yield rng
+            self.completed += 1
+        self.iteration = None
+
+    def result(self, error=None):
+        index, count = self.shard
+        result = {
+            "test": self.test,
+            "seed": self.seed,
+            "iterations": self.iterations,
+            "shard": f"{index}/{count}",
+            "completed": self.completed,
+            "status": "passed" if error is None else "failed",
+        }
+        if error is not None:
+            result.update(loop=self.loop, iteration=self.iteration, message=str(error) or type(error).__name__)
+        return result
+
+    def describe(self):
+        index, count = self.shard
+        text = f"TB_SEED={self.seed} TB_ITERATIONS={self.iterations} TB_SHARD={index}/{count}"
+        if self.iteration is not None:
+            text += f" TB_REPLAY={self.iteration} (loop {self.loop})"
+        return text
+
+    def save(self, result):
+        directory = os.environ.get("TB_RESULTS")
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.test}-{os.getpid()}.json"), "w", encoding="UTF-8") as f:
+            json.dump(result, f)
+
+
+def random_test(iterations, stateful=False, **kwargs):
+    # cocotb.test() for a test taking (dut, stimulus), running `iterations`
+    # per loop unless the environment says otherwise. Failures are logged
+    # with the settings reproducing them.
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(dut):
+            stimulus = Stimulus(func.__name__, iterations, stateful)
+            try:
+                await func(dut, stimulus)
+            except Exception as e:
+                dut._log.error(f"{func.__name__} failed, reproduce with {stimulus.describe()}")
+                stimulus.save(stimulus.result(e))
+                raise
+            stimulus.save(stimulus.result())
+
+        return cocotb.test(**kwargs)(wrapper)
+
+    return decorator
@@ -0,0 +1,290 @@
+# SIMULATION TELEMETRY
+#
+# Per-test performance figures, collected in the simulator when TB_TELEMETRY
+# names a directory. simulation_env() sets it up for a simulation: cocotb
+# then starts through entry() (PYGPI_ENTRY_POINT), which installs the probe
+# before any test module is imported. It records:
+# - wall time and simulated time, as cocotb measures them
+# - simulated cycles, for tests that started a clock with start_clock()
+# - time spent in Python (cocotb's event loop, so every coroutine and
+#   callback), the rest of the wall time being the simulator's
+# Each simulation appends one JSON line per test to <pid>.jsonl there.
+#
+# regress.py turns these into rows of a SQLite database along with the git
+# revision and the waveform bytes written, which the report command checks
+# for throughput regressions: the cycles (or simulated ns, for tests
+# without a clock) per second of the latest revision of each test against
+# the median of the revisions before it.
+#
+# Usage:
+#   python tb/telemetry.py report [--db FILE] [--threshold 0.1] [--history 5]
+#   python tb/telemetry.py show [--db FILE] [test ...]
+
+import importlib.metadata
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import time
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "target", "telemetry.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    revision TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    suite TEXT NOT NULL,
+    sim TEXT,
+    test TEXT NOT NULL,
+    status TEXT NOT NULL,
+    wall_s REAL NOT NULL,
+    sim_ns REAL NOT NULL,
+    cycles INTEGER,
+    python_s REAL,
+    waveform_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_test ON results (suite, test, recorded);
+"""
+
+_probe = None
+
+
+class _Probe:
+    def __init__(self, path):
+        self.path = path
+        # Python time of the finished event loops, and start of the current one
+        self.python = 0.0
+        self.loop_start = None
+        # Python time at the end of the previous test
+        self.last_python = 0.0
+        # Period of the last clock started by the current test, in ns
+        self.clock_period_ns = None
+
+    def python_time(self):
+        if self.loop_start is None:
+            return self.python
+        return self.python + time.perf_counter() - self.loop_start
+
+    def save(self, test, result):
+        python = self.python_time()
+        sim_ns = result["sim"]
+        record = {
+            "test": test.__qualname__,
+            "module": test.__module__,
+            "toplevel": os.environ.get("TOPLEVEL"),
+            "status": {True: "passed", False: "failed", None: "skipped"}[result["pass"]],
+            "wall_s": result["real"],
+            "sim_ns": sim_ns,
+            "cycles": round(sim_ns / self.clock_period_ns) if self.clock_period_ns else None,
+            "python_s": python - self.last_python,
+        }
+        self.last_python = python
+        self.clock_period_ns = None
+        with open(self.path, "a", encoding="UTF-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def install():
+    # Start collecting if TB_TELEMETRY is set. Relies on cocotb 1.x
+    # internals, and does nothing on versions without them. Called by
+    # entry(), testbenches don't need to.
+    global _probe
+    directory = os.environ.get("TB_TELEMETRY")
+    if not directory or _probe is not None:
+        return
+
+    from cocotb.regression import RegressionManager
+    from cocotb.scheduler import Scheduler
+
+    react = getattr(Scheduler, "_react", None)
+    record_result = getattr(RegressionManager, "_record_result", None)
+    if react is None or record_result is None:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    probe = _probe = _Probe(os.path.join(directory, f"{os.getpid()}.jsonl"))
+
+    def timed_react(self, trigger):
+        # Triggers fired from Python are queued by the running event loop
+        if probe.loop_start is not None:
+            return react(self, trigger)
+        probe.loop_start = time.perf_counter()
+        try:
+            return react(self, trigger)
+        finally:
+            probe.python += time.perf_counter() - probe.loop_start
+            probe.loop_start = None
+
+    def recorded_result(self, test, outcome, wall_time_s, sim_time_ns):
+        record_result(self, test, outcome, wall_time_s, sim_time_ns)
+        probe.save(test, self.test_results[-1])
+
+    Scheduler._react = timed_react
+    RegressionManager._record_result = recorded_result
+
+
+def entry(argv):
+    # Simulator entry point: cocotb's own, with the probe installed first
+    import cocotb
+
+    install()
+    return cocotb._initialise_testbench(argv)
+
+
+def simulation_env(env, directory, tb_dir):
+    # Environment for a simulation recording its telemetry to `directory`,
+    # with this module found in `tb_dir`. Unchanged for cocotb versions
+    # other than 1.x, whose entry point and internals this relies on.
+    try:
+        version = importlib.metadata.version("cocotb")
+    except importlib.metadata.PackageNotFoundError:
+        return dict(env)
+    if not version.startswith("1."):
+        return dict(env)
+    python_path = os.pathsep.join(p for p in (tb_dir, env.get("PYTHONPATH")) if p)
+    return dict(env, TB_TELEMETRY=directory, PYGPI_ENTRY_POINT="telemetry:entry", PYTHONPATH=python_path)
+
+
+def clock_started(period_ns):
+    # Called by start_clock(), for the cycle count of the current test
+    if _probe is not None:
+        _probe.clock_period_ns = period_ns
+
+
+def load_records(directory):
+    # Records saved by the simulations under `directory`
+    records = []
+    if os.path.isdir(directory):
+        for entry in sorted(os.listdir(directory)):
+            if entry.endswith(".jsonl"):
+                with open(os.path.join(directory, entry), "r", encoding="UTF-8") as f:
+                    records += [json.loads(line) for line in f if line.strip()]
+    return records
+
+
+def git_revision(repo):
+    # Short hash of HEAD, with a "-dirty" suffix for uncommitted changes
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=repo).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return revision + ("-dirty" if dirty else "")
+
+
+def connect(path=DEFAULT_DB):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript(_SCHEMA)
+    return db
+
+
+def store(db, revision, suite, records):
+    # Records of one suite, as returned by load_records() with the "sim"
+    # (veryl test) and "waveform_bytes" added by the runner
+    now = time.time()
+    db.executemany(
+        "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (revision, now, suite, r.get("sim"), r["test"], r["status"], r["wall_s"], r["sim_ns"],
+             r.get("cycles"), r.get("python_s"), r.get("waveform_bytes"))
+            for r in records
+        ],
+    )
+    db.commit()
+
+
+def throughput(cycles, sim_ns, wall_s):
+    # (value, unit): cycles per second, or simulated ns per second without a clock
+    if not wall_s:
+        return None, None
+    if cycles:
+        return cycles / wall_s, "cycles/s"
+    return sim_ns / wall_s, "ns/s"
+
+
+def regressions(db, threshold=0.1, history=5, min_seconds=0.1):
+    # Tests whose latest revision is slower than the median of the `history`
+    # revisions before it by more than `threshold`. Passing runs only, and
+    # only runs long enough for the timing to mean something.
+    rows = db.execute(
+        "SELECT suite, test, revision, cycles, sim_ns, wall_s FROM results "
+        "WHERE status = 'passed' AND wall_s >= ? ORDER BY recorded",
+        (min_seconds,),
+    ).fetchall()
+
+    # {(suite, test, unit): {revision: [throughput]}}, revisions in the
+    # order they were first recorded
+    series = {}
+    for suite, test, revision, cycles, sim_ns, wall_s in rows:
+        value, unit = throughput(cycles, sim_ns, wall_s)
+        series.setdefault((suite, test, unit), {}).setdefault(revision, []).append(value)
+
+    flagged = []
+    for (suite, test, unit), by_revision in sorted(series.items()):
+        revisions = list(by_revision.items())
+        if len(revisions) < 2:
+            continue
+        revision, values = revisions[-1]
+        latest = statistics.median(values)
+        baseline = statistics.median(statistics.median(v) for _, v in revisions[-1 - history:-1])
+        change = latest / baseline - 1
+        if change < -threshold:
+            flagged.append({"suite": suite, "test": test, "revision": revision, "unit": unit,
+                            "latest": latest, "baseline": baseline, "change": change})
+    return flagged
+
+
+def format_rows(rows):
+    lines = [f"{'revision':14} {'suite':12} {'test':28} {'status':8} {'wall s':>8} {'python':>7} "
+             f"{'cycles':>12} {'throughput':>18} {'waveform':>10}"]
+    for revision, suite, test, status, wall_s, sim_ns, cycles, python_s, waveform_bytes in rows:
+        value, unit = throughput(cycles, sim_ns, wall_s)
+        python = f"{python_s / wall_s:6.0%}" if python_s is not None and wall_s else "-"
+        rate = f"{value:,.0f} {unit}" if value is not None else "-"
+        waveform = f"{waveform_bytes / 1e6:.1f} MB" if waveform_bytes else "-"
+        lines.append(f"{revision:14} {suite:12} {test:28} {status:8} {wall_s:8.2f} {python:>7} "
+                     f"{cycles if cycles is not None else '-':>12} {rate:>18} {waveform:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulation telemetry")
+    parser.add_argument("--db", default=DEFAULT_DB, help="database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="flag throughput regressions")
+    report.add_argument("--threshold", type=float, default=0.1, help="relative slowdown to flag (default: 0.1)")
+    report.add_argument("--history", type=int, default=5, help="revisions in the baseline (default: 5)")
+    report.add_argument("--min-seconds", type=float, default=0.1, help="ignore shorter runs (default: 0.1)")
+    show = commands.add_parser("show", help="list the recorded results")
+    show.add_argument("tests", nargs="*", help="tests to show (default: all)")
+    show.add_argument("--limit", type=int, default=50, help="latest rows to show (default: 50)")
+    args = parser.parse_args(argv)
+
+    db = connect(args.db)
+    if args.command == "show":
+        query = ("SELECT revision, suite, test, status, wall_s, sim_ns, cycles, python_s, waveform_bytes "
+                 "FROM results")
+        if args.tests:
+            query += f" WHERE test IN ({', '.join('?' * len(args.tests))})"
+        query += " ORDER BY recorded DESC LIMIT ?"
+        print(format_rows(reversed(db.execute(query, (*args.tests, args.limit)).fetchall())))
+        return 0
+
+    flagged = regressions(db, args.threshold, args.history, args.min_seconds)
+    for r in flagged:
+        print(f"SLOWER   {r['suite']:12} {r['test']:28} {r['revision']:14} {r['latest']:>14,.0f} {r['unit']} "
+              f"vs {r['baseline']:,.0f} ({r['change']:+.0%})")
+    if not flagged:
+        print(f"No throughput regression beyond {args.threshold:.0%}")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
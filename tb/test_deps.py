@@ -0,0 +1,68 @@
+# Checks of the suite dependencies (deps.py) and of what regress.py records
+# for a passing run, on a scratch copy of the project.
+#
+# Usage:
+#   python -m pytest tb/test_deps.py
+
+import os
+import shutil
+
+import pytest
+
+from deps import REPO, Graph, discover
+from regress import PROJECT_FILES, run_key
+
+
+@pytest.fixture
+def project(tmp_path):
+    for entry in PROJECT_FILES:
+        source = os.path.join(REPO, entry)
+        if os.path.isdir(source):
+            shutil.copytree(source, tmp_path / entry, ignore=shutil.ignore_patterns("__pycache__"))
+        elif os.path.exists(source):
+            shutil.copy2(source, tmp_path)
+    return str(tmp_path)
+
+
+def hashes(repo):
+    graph = Graph(repo)
+    return {suite.name: graph.suite_hash(suite) for suite in discover(repo)}
+
+
+def changed_suites(repo, path):
+    before = hashes(repo)
+    with open(os.path.join(repo, path), "a", encoding="UTF-8") as f:
+        f.write("\n// changed\n")
+    after = hashes(repo)
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_top_sources_are_inputs():
+    # test_alu.veryl only names Alu in its #[test(...)]
+    graph = Graph()
+    suite = next(suite for suite in discover() if suite.name == "alu")
+    assert "src/cpu/alu.veryl" in graph.suite_inputs(suite)
+
+
+def test_dut_change_reruns_its_suites(project):
+    changed = changed_suites(project, "src/cpu/alu.veryl")
+    assert {"alu", "cpu"} <= changed
+    assert "uart" not in changed
+
+
+def test_uart_change_reruns_uart_only(project):
+    # The Soc has no Uart
+    assert changed_suites(project, "src/peripherals/uart.veryl") == {"uart"}
+
+
+def test_testbench_change_reruns_its_suites(project):
+    assert changed_suites(project, "tb/uart_bfm.py") == {"uart"}
+
+
+def test_run_key_covers_settings():
+    plain = run_key("inputs", env={})
+    assert run_key("inputs", env={}) == plain
+    assert run_key("other", env={}) != plain
+    assert run_key("inputs", wave=True, env={}) != plain
+    for name in ("TB_SEED", "TB_ITERATIONS", "TB_SHARD", "TB_REPLAY", "TESTCASE"):
+        assert run_key("inputs", env={name: "1"}) != plain
@@ -0,0 +1,261 @@
+# PYTHON CODECS FOR THE RTL TYPES
+#
+# Reads the enums and packed structs of src/types.veryl and
+# src/memory/mem_pkg.veryl and generates a Python module with:
+# - an IntEnum per enum (types::Opcode, memory::RamSource, ...)
+# - a __slots__ decoder class per struct, with SHIFT/MASK tables, a
+#   constructor that unpacks a packed value and a pack() method
+#
+# The generated module is cached under VHC_CODEC_CACHE (target/codecs next
+# to this file's directory by default, so the repository's target/ whatever
+# the current directory), keyed by a hash of the Veryl sources and of this
+# generator, so it is only regenerated when the RTL changes. Where the
+# cache can't be written, the module is built in memory instead.
+#
+#   from typegen import rtl
+#   rtl.Opcode.r_type, rtl.Writeback(packed).dest_reg
+#
+# Usage:
+#   python typegen.py [out.py]    prints or writes the generated module
+
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import types
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "target", "codecs")
+
+# Bump when the generated code changes
+GENERATOR_VERSION = 1
+
+# Veryl sources, as copied in the simulation directory (include_files) or
+# relative to the repository
+SOURCES = (
+    ("types.veryl", os.path.join("src", "types.veryl")),
+    ("mem_pkg.veryl", os.path.join("src", "memory", "mem_pkg.veryl")),
+)
+
+BUILTIN_WIDTHS = {"bool": 1, "bit": 1, "logic": 1, "u8": 8, "i8": 8, "u16": 16, "i16": 16, "u32": 32, "i32": 32, "u64": 64, "i64": 64}
+
+_PACKAGE = re.compile(r"package\s+(\w+)\s*\{")
+_ENUM = re.compile(r"enum\s+(\w+)\s*:\s*(\w+)\s*(?:<\s*(\d+)\s*>)?\s*\{([^}]*)\}")
+_ENUM_MEMBER = re.compile(r"(\w+)\s*(?:=\s*([^,]+))?")
+_STRUCT = re.compile(r"struct\s+(\w+)\s*\{([^}]*)\}")
+_STRUCT_FIELD = re.compile(r"(\w+)\s*:\s*([\w:]+)\s*(?:<\s*(\d+)\s*>)?")
+_TYPEDEF = re.compile(r"type\s+(\w+)\s*=\s*(\w+)\s*(?:<\s*(\d+)\s*>)?\s*;")
+
+
+class Package:
+    def __init__(self, name):
+        self.name = name
+        # name -> (width, [(member, value)])
+        self.enums = {}
+        # name -> [(field, width, type name)], MSB first as in the source
+        self.structs = {}
+
+
+def parse_literal(text):
+    # Veryl/SystemVerilog integer literal: 3'b010, 8'hFF, 'b1, 42
+    text = text.strip().replace("_", "")
+    if "'" in text:
+        base = text.split("'", 1)[1]
+        radix = {"b": 2, "o": 8, "d": 10, "h": 16}[base[0].lower()]
+        return int(base[1:], radix)
+    return int(text, 0)
+
+
+def _width(widths, type_name, size):
+    type_name = type_name.split("::")[-1]
+    if type_name not in widths:
+        raise ValueError(f"Unknown type {type_name}")
+    if size is not None:
+        return widths[type_name] * int(size)
+    return widths[type_name]
+
+
+def parse(text, widths=None):
+    # Parse the packages of a Veryl source. `widths` maps type names to bit
+    # widths, and is extended with the enums/typedefs found, so that later
+    # sources can refer to earlier ones.
+    widths = dict(BUILTIN_WIDTHS) if widths is None else widths
+    text = re.sub(r"//.*", "", text)
+
+    packages = []
+    matches = list(_PACKAGE.finditer(text))
+    for i, match in enumerate(matches):
+        body = text[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)]
+        package = Package(match.group(1))
+
+        for name, base, size in _TYPEDEF.findall(body):
+            widths[name] = _width(widths, base, size or None)
+
+        for name, base, size, members in _ENUM.findall(body):
+            width = _width(widths, base, size or None)
+            values = []
+            next_value = 0
+            for member in members.split(","):
+                member = member.strip()
+                if not member:
+                    continue
+                m = _ENUM_MEMBER.fullmatch(member)
+                value = parse_literal(m.group(2)) if m.group(2) else next_value
+                values.append((m.group(1), value))
+                next_value = value + 1
+            package.enums[name] = (width, values)
+            widths[name] = width
+
+        for name, fields in _STRUCT.findall(body):
+            layout = []
+            for field in fields.split(","):
+                field = field.strip()
+                if not field:
+                    continue
+                m = _STRUCT_FIELD.fullmatch(field)
+                layout.append((m.group(1), _width(widths, m.group(2), m.group(3)), m.group(2).split("::")[-1]))
+            package.structs[name] = layout
+            widths[name] = sum(w for _, w, _ in layout)
+
+        packages.append(package)
+    return packages
+
+
+def generate(packages, sources=()):
+    out = [
+        "# Generated by tb/typegen.py from " + ", ".join(sources) + ", do not edit",
+        "",
+        "import enum",
+        "",
+    ]
+    seen = set()
+
+    def class_name(package, name):
+        # Prefix with the package in the unlikely case of a name clash
+        if name in seen:
+            name = package.name.capitalize() + name
+        seen.add(name)
+        return name
+
+    for package in packages:
+        for name, (width, values) in package.enums.items():
+            out += ["", f"class {class_name(package, name)}(enum.IntEnum):"]
+            out.append(f"    # {package.name}::{name}, {width}-bit")
+            for member, value in values:
+                # Python keywords (and, or, ...) get a trailing underscore
+                if member in ("and", "or", "not", "is", "in", "if", "else", "class", "def", "None", "True", "False"):
+                    member += "_"
+                out.append(f"    {member} = 0b{value:0{width}b}")
+            out.append("")
+
+        for name, layout in package.structs.items():
+            width = sum(w for _, w, _ in layout)
+            shifts = []
+            shift = width
+            for field, field_width, _ in layout:
+                shift -= field_width
+                shifts.append((field, shift, (1 << field_width) - 1))
+
+            cls = class_name(package, name)
+            out += ["", f"class {cls}:"]
+            out.append(f"    # {package.name}::{name}, {width}-bit packed, first field in the MSBs")
+            out.append(f"    __slots__ = ({', '.join(repr(f) for f, _, _ in shifts)},)")
+            out.append(f"    WIDTH = {width}")
+            out.append(f"    SHIFT = {{{', '.join(f'{f!r}: {s}' for f, s, _ in shifts)}}}")
+            out.append(f"    MASK = {{{', '.join(f'{f!r}: 0x{m:x}' for f, _, m in shifts)}}}")
+            out.append("")
+            out.append("    def __init__(self, packed=0):")
+            for field, s, m in shifts:
+                out.append(f"        self.{field} = (packed >> {s}) & 0x{m:x}" if s else f"        self.{field} = packed & 0x{m:x}")
+            out.append("")
+            out.append("    def pack(self):")
+            terms = [f"((self.{f} & 0x{m:x}) << {s})" if s else f"(self.{f} & 0x{m:x})" for f, s, m in shifts]
+            out.append("        return " + " | ".join(terms))
+            out.append("")
+            out.append("    @classmethod")
+            out.append("    def encode(cls, **fields):")
+            out.append("        value = cls()")
+            out.append("        for field, field_value in fields.items():")
+            out.append("            setattr(value, field, int(field_value))")
+            out.append("        return value.pack()")
+            out.append("")
+            out.append("    def __eq__(self, other):")
+            out.append("        return type(self) is type(other) and self.pack() == other.pack()")
+            out.append("")
+            out.append("    def __repr__(self):")
+            fields = ", ".join(f"{f}={{self.{f}!r}}" for f, _, _ in shifts)
+            out.append(f"        return f\"{cls}({fields})\"")
+            out.append("")
+
+    return "\n".join(out).rstrip() + "\n"
+
+
+def find_sources():
+    # Paths of the Veryl sources, in the current directory or the repository
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    paths = []
+    for name, repo_path in SOURCES:
+        for path in (name, os.path.join(repo, repo_path)):
+            if os.path.exists(path):
+                paths.append(path)
+                break
+        else:
+            raise FileNotFoundError(f"Can't find {name} or {repo_path}")
+    return paths
+
+
+def build(paths):
+    # Generated module source
+    widths = dict(BUILTIN_WIDTHS)
+    packages = []
+    for path in paths:
+        with open(path, "r", encoding="UTF-8") as f:
+            packages += parse(f.read(), widths)
+    return generate(packages, [os.path.basename(p) for p in paths])
+
+
+def cache_key(paths):
+    digest = hashlib.sha256(f"typegen {GENERATOR_VERSION}\n".encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:32]
+
+
+def load(paths=None, cache_dir=None):
+    # Import the generated module, regenerating it if the sources changed
+    paths = paths or find_sources()
+    cache_dir = cache_dir or os.environ.get("VHC_CODEC_CACHE", DEFAULT_CACHE_DIR)
+
+    path = os.path.join(cache_dir, f"rtl_{cache_key(paths)}.py")
+
+    if not os.path.exists(path):
+        source = build(paths)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="UTF-8") as f:
+                f.write(source)
+            os.replace(tmp, path)
+        except OSError:
+            # Read-only cache: no caching, the generator is fast anyway
+            module = types.ModuleType("rtl")
+            exec(compile(source, "rtl", "exec"), module.__dict__)
+            return module
+
+    spec = importlib.util.spec_from_file_location("rtl", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+rtl = load()
+
+
+if __name__ == "__main__":
+    source = build(find_sources())
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "w", encoding="UTF-8") as f:
+            f.write(source)
+    else:
+        print(source, end="")
@@ -1,30 +1,99 @@
+import random
 
 import cocotb
-from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge
+from cocotb.triggers import FallingEdge, RisingEdge
+from cocotb.utils import get_sim_time
+
+from bram_bfm import BramMaster
+from clocking import start_clock
+from uart_bfm import UartBfm, UartSimPort
+
+TEST_BYTES = 16
+
+
+async def setup(dut):
+    # Reset the Uart and connect the BFM to its line, or the byte-level
+    # model for a SIM_ACCEL Uart
+    clock = start_clock(dut.clk)
+    master = BramMaster(dut.bus, dut.clk).start()
 
-@cocotb.test()
-async def cpu_integration_test(dut):
-    cocotb.start_soon(Clock(dut.clk, 1, units="ns").start())
-    
     await RisingEdge(dut.clk)
-    dut.rst = 0
+    dut.rst.value = 0
 
     await RisingEdge(dut.clk)
-    dut.rst = 1
+    dut.rst.value = 1
 
-    dut.bus.enable = 1
-    dut.bus.address = 0
-    dut.bus.byte_write_enable = 0b1
-    dut.bus.write_data = 0xAA
+    clock_freq = int(dut.clock_freq.value)
+    baud_rate = int(dut.baud_rate.value)
+    cycles_per_bit = clock_freq // baud_rate
+    dut._log.info(f"{baud_rate} baud, {clock_freq} Hz clock, {cycles_per_bit} cycles per bit")
+    if int(dut.sim_accel.value):
+        dut._log.info("Simulation-only Uart, the line is bypassed")
+        port = UartSimPort(dut.uart, dut.clk)
+    else:
+        port = UartBfm(dut.tx, dut.rx, clock, clock_freq, baud_rate)
+    return clock, master, port.start(), cycles_per_bit
 
-    await RisingEdge(dut.clk)
 
-    dut.bus.enable = 0
-    dut.bus.address = 0
-    dut.bus.write_data = 0
-    dut.bus.byte_write_enable = 0
+def check_throughput(dut, clock, port, cycles_per_bit, count, start):
+    # Line time of `count` bytes against the 10 bit times per byte of 8N1.
+    # The last byte counts as soon as its stop bit is sampled
+    cycles = (get_sim_time("step") - start) // clock.period
+    line_cycles = 10 * cycles_per_bit * count
+    dut._log.info(f"{count} bytes in {cycles} cycles, {cycles / count:.1f} cycles per byte ({line_cycles / cycles:.0%} of the line rate)")
+    if isinstance(port, UartSimPort):
+        assert 100 * cycles <= line_cycles, f"{count} bytes in {cycles} cycles, the simulation-only Uart should be 100x faster than the line"
+        return
+    assert cycles >= line_cycles - cycles_per_bit, f"{count} bytes in {cycles} cycles, faster than the line allows"
+    assert cycles <= 2 * line_cycles, f"{count} bytes in {cycles} cycles, less than half the line rate"
+
+
+async def uart_write(dut, master, data):
+    # Write a byte to the TX register, repeating the write until the Uart
+    # takes it
+    while True:
+        await master.write(0, data, 0b1)
+        if int(dut.uart.tx_enable.value):
+            return
+
+
+@cocotb.test()
+async def uart_tx_test(dut):
+    clock, master, port, cycles_per_bit = await setup(dut)
+    data = bytes(random.Random(0).randrange(256) for _ in range(TEST_BYTES))
+
+    start = get_sim_time("step")
+    for byte in data:
+        await uart_write(dut, master, byte)
+        # Transmitting until tx_finish
+        if int(dut.uart.tx_enable.value):
+            await FallingEdge(dut.uart.tx_enable)
+
+    received = await port.read(len(data))
+    check_throughput(dut, clock, port, cycles_per_bit, len(data), start)
+
+    assert received == data, f"Sent {data.hex()}, line carried {received.hex()}"
+    if isinstance(port, UartBfm):
+        assert port.framing_errors == 0
+
+
+@cocotb.test()
+async def uart_rx_test(dut):
+    clock, master, port, cycles_per_bit = await setup(dut)
+    data = bytes(random.Random(1).randrange(256) for _ in range(TEST_BYTES))
+
+    start = get_sim_time("step")
+    port.send(data)
+
+    received = bytearray()
+    rx_ready = dut.uart.rx_ready
+    for _ in data:
+        # With the bus idle, the cycle after rx_ready the byte is read out
+        # and rx_ready drops again
+        await RisingEdge(rx_ready)
+        await FallingEdge(rx_ready)
+        received.append(int(dut.bus.read_data.value) & 0xFF)
+
+    check_throughput(dut, clock, port, cycles_per_bit, len(data), start)
 
-    for _ in range(0,200):
-        await RisingEdge(dut.clk)
- 
\ No newline at end of file
+    assert received == data, f"Sent {data.hex()}, Uart read {received.hex()}"
@@ -0,0 +1,152 @@
+# UART BUS-FUNCTIONAL MODEL
+#
+# 8N1 serial line model for the Uart peripheral:
+# - the monitor waits for the falling edge of a start bit on `tx`, then
+#   samples the data and stop bits at their centers with timers, so the
+#   line costs a handful of Python wake-ups per byte, whatever the baud rate
+# - the driver shifts bytes queued with send() out on `rx`
+#
+# Bit timing is CLOCK_FREQ // BAUD_RATE clock cycles per bit, like the
+# uarty divider.
+#
+#   bfm = UartBfm(dut.tx, dut.rx, clock, CLOCK_FREQ, BAUD_RATE).start()
+#   bfm.send(b"hi")
+#   byte = await bfm.recv()
+#   async for byte in bfm: ...
+#
+# UartSimPort has the same interface for a Uart built with SIM_ACCEL: bytes
+# are captured on the bus write that starts a transmission and received
+# bytes are written straight into rx_reg/rx_ready, so nothing is serialized.
+
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import FallingEdge, RisingEdge, Timer
+
+
+class _ByteStream:
+    # Received bytes, as an async stream
+    def __init__(self):
+        self.received = Queue()
+        self._to_send = Queue()
+
+    async def recv(self):
+        # Next byte sent by the Uart
+        return await self.received.get()
+
+    async def read(self, n):
+        return bytes([await self.received.get() for _ in range(n)])
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.received.get()
+
+    def send(self, data):
+        # Queue bytes for the Uart to receive
+        for byte in bytes(data):
+            self._to_send.put_nowait(byte)
+
+
+class UartBfm(_ByteStream):
+    def __init__(self, tx, rx, clock, clock_freq, baud_rate):
+        super().__init__()
+        self.tx = tx
+        self.rx = rx
+        self.cycles_per_bit = clock_freq // baud_rate
+        if self.cycles_per_bit < 2:
+            raise ValueError(f"{baud_rate} baud is too fast for a {clock_freq} Hz clock")
+        # Bit time in simulator steps
+        self.bit_time = self.cycles_per_bit * clock.period
+        self.framing_errors = 0
+
+    def start(self):
+        self.rx.value = 1
+        cocotb.start_soon(self._monitor())
+        cocotb.start_soon(self._driver())
+        return self
+
+    # -- Line -> testbench --
+
+    async def _monitor(self):
+        tx = self.tx
+        bit = Timer(self.bit_time, "step")
+        half_bit = Timer(self.bit_time // 2, "step")
+        while True:
+            await FallingEdge(tx)
+            await half_bit
+            if int(tx.value):
+                # Glitch, not a start bit
+                continue
+
+            byte = 0
+            for i in range(8):
+                await bit
+                byte |= int(tx.value) << i
+
+            await bit
+            if not int(tx.value):
+                self.framing_errors += 1
+                # Wait for the line to go back to idle
+                continue
+            self.received.put_nowait(byte)
+
+    # -- Testbench -> line --
+
+    async def _driver(self):
+        rx = self.rx
+        bit = Timer(self.bit_time, "step")
+        while True:
+            byte = await self._to_send.get()
+            rx.value = 0
+            await bit
+            for i in range(8):
+                rx.value = (byte >> i) & 1
+                await bit
+            rx.value = 1
+            await bit
+
+    async def drain(self):
+        # Wait until everything queued with send() is on the line
+        while not self._to_send.empty():
+            await Timer(self.bit_time, "step")
+        await Timer(10 * self.bit_time, "step")
+
+
+class UartSimPort(_ByteStream):
+    # Byte-level model for a Uart instance built with SIM_ACCEL
+    def __init__(self, uart, clk):
+        super().__init__()
+        self.uart = uart
+        self.clk = clk
+
+    def start(self):
+        cocotb.start_soon(self._capture())
+        cocotb.start_soon(self._inject())
+        return self
+
+    async def _capture(self):
+        # tx_enable and tx_data are set by the same bus write
+        tx_enable = self.uart.tx_enable
+        tx_data = self.uart.tx_data
+        while True:
+            await RisingEdge(tx_enable)
+            self.received.put_nowait(int(tx_data.value))
+
+    async def _inject(self):
+        rx_ready = self.uart.rx_ready
+        rx_reg = self.uart.rx_reg
+        falling = FallingEdge(self.clk)
+        while True:
+            byte = await self._to_send.get()
+            # Don't overwrite a byte the Uart hasn't read yet
+            while int(rx_ready.value):
+                await FallingEdge(rx_ready)
+            # Away from the rising edge that samples it
+            await falling
+            rx_reg.value = byte
+            rx_ready.value = 1
+
+    async def drain(self):
+        while not self._to_send.empty() or int(self.uart.rx_ready.value):
+            await RisingEdge(self.clk)
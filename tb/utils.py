@@ -1,4 +1,6 @@
-import cocotb
+from array import array
+
+from typegen import rtl
 
 def bin_to_hex(bin_str):
     # Convert binary string to hexadecimal
@@ -12,14 +14,55 @@ def hex_to_bin(hex_str):
     bin_str = bin_str.zfill(32)
     return bin_str.upper()
 
-@cocotb.coroutine
-async def init_memory(mem, hexfile):
-    offset = 0
-    for raw_instruction in hexfile.splitlines() :
-        str_instruction = raw_instruction.split("/")[0].strip()
+def to_int(value):
+    # Integer value of a signal, with X/Z bits read as 0
+    try:
+        return int(value)
+    except ValueError:
+        return int(value.binstr.replace("x", "0").replace("X", "0").replace("z", "0").replace("Z", "0"), 2)
+
+class Writeback(rtl.Writeback):
+    # types::Writeback, decoded by the generated codec (see typegen.py)
+    __slots__ = ()
+
+    def __str__(self):
+        return f"Writeback: data: 0x{self.data:08x}, dest_reg: {self.dest_reg}, reg_write: {self.reg_write}, be_mask: 0b{self.byte_enable_mask:04b}, is_mem_read: {self.is_mem_read}"
+
+    def assert_wb(self, dest_reg, expected):
+        assert self.data == expected, f'Expected 0x{expected:08x}, got 0x{self.data:08x} at register {self.dest_reg}'
+        assert self.dest_reg == dest_reg, f'Expected destination register {dest_reg}, got {self.dest_reg}'
+
+def parse_hex(hexfile):
+    # Parse a hex image (one 32-bit word per line, "//" comments allowed)
+    # into a compact array of unsigned words
+    words = array("I")
+    for line in hexfile.splitlines():
+        word = line.split("/", 1)[0].strip()
         # Skip empty lines
-        if str_instruction != "":
-            print(str_instruction)
-            instruction = int(str_instruction, 16)
-            mem[offset].value = instruction
-            offset += 1
\ No newline at end of file
+        if word:
+            words.append(int(word, 16))
+    return words
+
+def load_words(mem, words, offset=0):
+    # Write a word array into a memory array handle with a single assignment.
+    # `offset` is the index of the first word to write. When the image does
+    # not cover the whole memory, the untouched words are read back first
+    # so that a partial load leaves the rest of the memory as it was.
+    depth = len(mem)
+    end = offset + len(words)
+    if offset < 0 or end > depth:
+        raise ValueError(f"Image of {len(words)} words at offset {offset} does not fit in memory of depth {depth}")
+
+    if offset == 0 and end == depth:
+        contents = list(words)
+    else:
+        contents = [int(v) if v.is_resolvable else 0 for v in mem.value]
+        contents[offset:end] = words
+    mem.value = contents
+
+async def init_memory(mem, hexfile, offset=0, verbose=False):
+    words = parse_hex(hexfile)
+    if verbose:
+        for word in words:
+            print(f"{word:08X}")
+    load_words(mem, words, offset)
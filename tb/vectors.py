@@ -0,0 +1,321 @@
+# VECTORIZED STIMULUS FOR COMBINATIONAL UNITS
+#
+# Instead of drawing one random value at a time and computing its expected
+# result in the test loop, input vectors are generated up front as NumPy
+# arrays and the expected outputs come from vectorized golden models. The
+# simulation loop then only drives one vector per time step and records the
+# outputs; everything is checked at once at the end.
+#
+#   inputs = {"alu_control": control, "src1": random_words(rng, n), "src2": random_words(rng, n)}
+#   got = await drive(dut, inputs, ("alu_result",))
+#   check("alu_result", got["alu_result"], alu_model(*inputs.values())[0], inputs)
+#
+# All values are uint32 arrays.
+
+import numpy as np
+from cocotb.triggers import Timer
+
+from typegen import rtl
+from utils import to_int
+
+# Mismatches listed in a failure message
+MAX_REPORTED = 10
+
+
+def random_words(rng, n, bits=32):
+    # n random `bits`-bit values
+    return rng.integers(0, (1 << bits) - 1, size=n, dtype=np.uint32, endpoint=True)
+
+
+def random_choice(rng, n, values):
+    # n values drawn from `values`
+    return rng.choice(np.array([int(v) for v in values], dtype=np.uint32), size=n)
+
+
+async def drive(dut, inputs, outputs, settle=None):
+    # Apply vector i of every `inputs` array (signal name -> array) during
+    # time step i, and return the sampled `outputs` as signal name -> array
+    settle = settle or Timer(1, "ns")
+    n = len(next(iter(inputs.values())))
+
+    # Python ints are much faster to assign than NumPy scalars
+    stimulus = [(getattr(dut, name), values.tolist()) for name, values in inputs.items()]
+    handles = [getattr(dut, name) for name in outputs]
+    sampled = [[0] * n for _ in outputs]
+    # Last value written to each input, only changes are written
+    current = [None] * len(stimulus)
+
+    for i in range(n):
+        for j, (handle, values) in enumerate(stimulus):
+            value = values[i]
+            if value != current[j]:
+                handle.value = current[j] = value
+        await settle
+        for handle, column in zip(handles, sampled):
+            column[i] = to_int(handle.value)
+
+    return {name: np.array(column, dtype=np.uint32) for name, column in zip(outputs, sampled)}
+
+
+def check(name, got, expected, inputs, mask=None):
+    # Assert got == expected on the bits set in `mask`, listing the first
+    # mismatching vectors with their inputs
+    diff = np.bitwise_xor(got, expected)
+    if mask is not None:
+        diff &= mask
+    failures = np.flatnonzero(diff)
+    if not len(failures):
+        return
+
+    lines = [f"{name}: {len(failures)} of {len(got)} vectors mismatch"]
+    for i in failures[:MAX_REPORTED]:
+        stimulus = ", ".join(f"{input_name}=0x{int(values[i]):x}" for input_name, values in inputs.items())
+        lines.append(f"  vector {i}: {stimulus}: got 0x{int(got[i]):08x}, expected 0x{int(expected[i]):08x}")
+    raise AssertionError("\n".join(lines))
+
+
+# -- Golden models --
+
+def alu_model(control, src1, src2):
+    # (alu_result, zero, last_bit) of Alu
+    shamt = src2 & 0x1F
+    signed1 = src1.view(np.int32)
+    signed2 = src2.view(np.int32)
+
+    result = np.zeros_like(src1)
+    ops = (
+        (rtl.AluControl.add, lambda: src1 + src2),
+        (rtl.AluControl.sub, lambda: src1 - src2),
+        (rtl.AluControl.and_, lambda: src1 & src2),
+        (rtl.AluControl.or_, lambda: src1 | src2),
+        (rtl.AluControl.xor, lambda: src1 ^ src2),
+        (rtl.AluControl.slt, lambda: (signed1 < signed2).astype(np.uint32)),
+        (rtl.AluControl.sltu, lambda: (src1 < src2).astype(np.uint32)),
+        (rtl.AluControl.sll, lambda: src1 << shamt),
+        (rtl.AluControl.srl, lambda: src1 >> shamt),
+        (rtl.AluControl.sra, lambda: (signed1 >> shamt.astype(np.int32)).view(np.uint32)),
+    )
+    with np.errstate(over="ignore"):
+        for op, compute in ops:
+            selected = control == int(op)
+            if selected.any():
+                result[selected] = compute()[selected]
+
+    zero = (result == 0).astype(np.uint32)
+    last_bit = result & 1
+    return result, zero, last_bit
+
+
+def _bits(value, high, low):
+    return (value >> low) & ((1 << (high - low + 1)) - 1)
+
+
+def _sign_fill(raw_src, width):
+    # All ones above `width` bits when raw_src[24] (the instruction's bit 31) is set
+    return np.where(raw_src >> 24 & 1, np.uint32((0xFFFFFFFF << width) & 0xFFFFFFFF), np.uint32(0))
+
+
+def signext_model(raw_src, imm_source):
+    # immediate of Signext, raw_src being instruction[31:7]
+    i_type = _sign_fill(raw_src, 12) | _bits(raw_src, 24, 13)
+    s_type = _sign_fill(raw_src, 12) | _bits(raw_src, 24, 18) << 5 | _bits(raw_src, 4, 0)
+    b_type = _sign_fill(raw_src, 12) | (raw_src & 1) << 11 | _bits(raw_src, 23, 18) << 5 | _bits(raw_src, 4, 1) << 1
+    j_type = _sign_fill(raw_src, 20) | _bits(raw_src, 12, 5) << 12 | _bits(raw_src, 13, 13) << 11 | _bits(raw_src, 23, 14) << 1
+    u_type = _bits(raw_src, 24, 5) << 12
+
+    return np.select(
+        [imm_source == int(rtl.ImmSource.i_type),
+         imm_source == int(rtl.ImmSource.s_type),
+         imm_source == int(rtl.ImmSource.b_type),
+         imm_source == int(rtl.ImmSource.j_type),
+         imm_source == int(rtl.ImmSource.u_type)],
+        [i_type, s_type, b_type, j_type, u_type],
+        np.uint32(0),
+    ).astype(np.uint32)
+
+
+# Byte lanes of every 4-bit byte enable
+_BE_MASKS = np.array([sum(0xFF << 8 * b for b in range(4) if be >> b & 1) for be in range(16)], dtype=np.uint32)
+
+
+def reader_model(mem_data, be_mask, f3):
+    # (wb_data, valid) of Reader
+    masked = mem_data & _BE_MASKS[be_mask]
+    is_byte = (f3 == int(rtl.LoadStoreFunct3.byte)) | (f3 == int(rtl.LoadStoreFunct3.byte_u))
+    is_half = (f3 == int(rtl.LoadStoreFunct3.halfword)) | (f3 == int(rtl.LoadStoreFunct3.halfword_u))
+    is_word = f3 == int(rtl.LoadStoreFunct3.word)
+    sign_extend = (f3 >> 2 & 1) == 0
+
+    # Shift amount of each one-hot byte / aligned halfword mask, -1 otherwise
+    byte_shift = np.full(16, -1, dtype=np.int64)
+    byte_shift[[0b0001, 0b0010, 0b0100, 0b1000]] = [0, 8, 16, 24]
+    half_shift = np.full(16, -1, dtype=np.int64)
+    half_shift[[0b0011, 0b1100]] = [0, 16]
+
+    shift = np.where(is_byte, byte_shift[be_mask], np.where(is_half, half_shift[be_mask], -1))
+    raw = np.where(shift >= 0, masked >> np.maximum(shift, 0).astype(np.uint32), np.uint32(0))
+
+    byte = raw & 0xFF
+    byte = np.where(sign_extend & (byte >> 7 == 1), byte | np.uint32(0xFFFFFF00), byte)
+    half = raw & 0xFFFF
+    half = np.where(sign_extend & (half >> 15 == 1), half | np.uint32(0xFFFF0000), half)
+
+    wb_data = np.select([is_word, is_byte, is_half], [masked, byte, half], np.uint32(0))
+    valid = (be_mask != 0).astype(np.uint32)
+    return wb_data.astype(np.uint32), valid
+
+
+def load_store_model(address, f3, data_in):
+    # (byte_enable, data_out, data_out mask) of LoadStoreDecoder. data_out
+    # is X when no byte is written, the mask clears those vectors.
+    offset = address & 3
+    is_byte = (f3 == int(rtl.LoadStoreFunct3.byte)) | (f3 == int(rtl.LoadStoreFunct3.byte_u))
+    is_half = (f3 == int(rtl.LoadStoreFunct3.halfword)) | (f3 == int(rtl.LoadStoreFunct3.halfword_u))
+    is_word = f3 == int(rtl.LoadStoreFunct3.word)
+
+    byte_enable = np.select(
+        [is_byte, is_half & (offset == 0), is_half & (offset == 2), is_word & (offset == 0)],
+        [np.uint32(1) << offset, np.uint32(0b0011), np.uint32(0b1100), np.uint32(0b1111)],
+        np.uint32(0),
+    ).astype(np.uint32)
+
+    data_out = np.select(
+        [is_byte, is_half & (offset == 0), is_half & (offset == 2), is_word],
+        [(data_in & 0xFF) << (offset * 8), data_in & 0xFFFF, (data_in & 0xFFFF) << 16, data_in],
+        np.uint32(0),
+    ).astype(np.uint32)
+
+    # SW keeps driving data_out even when misaligned
+    mask = np.where((byte_enable != 0) | is_word, np.uint32(0xFFFFFFFF), np.uint32(0))
+    return byte_enable, data_out, mask
+
+
+# Outputs of Control
+CONTROL_OUTPUTS = (
+    "alu_control",
+    "imm_source",
+    "mem_write",
+    "mem_read",
+    "reg_write",
+    "alu_source",
+    "write_back_source",
+    "pc_source",
+    "second_add_source",
+)
+
+
+def _main_decoder_table():
+    # Control's main decoder as one array per signal, indexed by opcode
+    Opcode, ImmSource, AluOp = rtl.Opcode, rtl.ImmSource, rtl.AluOp
+    AluSource, WritebackSrc, SecondAddSource = rtl.AluSource, rtl.WritebackSrc, rtl.SecondAddSource
+
+    default = dict(
+        reg_write=0, imm_source=ImmSource.i_type, alu_source=AluSource.src2, mem_write=0, mem_read=0,
+        alu_op=AluOp.load_store, write_back_source=WritebackSrc.pc_plus_4, branch=0, jump=0,
+        second_add_source=SecondAddSource.pc_plus_immediate,
+    )
+    rows = {
+        Opcode.i_type_load: dict(
+            reg_write=1, mem_read=1, alu_source=AluSource.immediate, write_back_source=WritebackSrc.mem_read,
+        ),
+        # reg_write also depends on funct3/funct7, see control_model
+        Opcode.i_type_alu: dict(
+            reg_write=1, alu_op=AluOp.math, alu_source=AluSource.immediate, write_back_source=WritebackSrc.alu_result,
+        ),
+        Opcode.s_type: dict(
+            imm_source=ImmSource.s_type, mem_write=1, alu_source=AluSource.immediate, write_back_source=WritebackSrc.alu_result,
+        ),
+        Opcode.r_type: dict(reg_write=1, alu_op=AluOp.math, write_back_source=WritebackSrc.alu_result),
+        Opcode.b_type: dict(
+            imm_source=ImmSource.b_type, alu_op=AluOp.branches, write_back_source=WritebackSrc.alu_result, branch=1,
+        ),
+        Opcode.j_type: dict(reg_write=1, imm_source=ImmSource.j_type, jump=1),
+        Opcode.j_type_jalr: dict(reg_write=1, jump=1, second_add_source=SecondAddSource.reg1_plus_immediate),
+        Opcode.u_type_lui: dict(
+            reg_write=1, imm_source=ImmSource.u_type, write_back_source=WritebackSrc.upper_imm,
+            second_add_source=SecondAddSource.raw_immediate,
+        ),
+        Opcode.u_type_auipc: dict(reg_write=1, imm_source=ImmSource.u_type, write_back_source=WritebackSrc.upper_imm),
+    }
+
+    table = {field: np.full(128, int(value), dtype=np.uint32) for field, value in default.items()}
+    for op, row in rows.items():
+        for field, value in row.items():
+            table[field][int(op)] = int(value)
+    return table
+
+
+def _alu_decoder_table():
+    # AluControl by [alu_op, funct3], before the funct7 special cases
+    AluControl, Funct3, BranchFunct3 = rtl.AluControl, rtl.Funct3, rtl.BranchFunct3
+
+    table = np.full((4, 8), int(AluControl.undefined), dtype=np.uint32)
+    table[int(rtl.AluOp.load_store), :] = int(AluControl.add)
+
+    math = {
+        Funct3.add_sub: AluControl.add,
+        Funct3.and_: AluControl.and_,
+        Funct3.or_: AluControl.or_,
+        Funct3.slt: AluControl.slt,
+        Funct3.sltu: AluControl.sltu,
+        Funct3.xor: AluControl.xor,
+        Funct3.sll: AluControl.sll,
+        Funct3.srl_sra: AluControl.srl,
+    }
+    branches = {
+        BranchFunct3.beq: AluControl.sub,
+        BranchFunct3.bne: AluControl.sub,
+        BranchFunct3.blt: AluControl.slt,
+        BranchFunct3.bge: AluControl.slt,
+        BranchFunct3.bltu: AluControl.sltu,
+        BranchFunct3.bgeu: AluControl.sltu,
+    }
+    for alu_op, mapping in ((rtl.AluOp.math, math), (rtl.AluOp.branches, branches)):
+        for funct3, alu_control in mapping.items():
+            table[int(alu_op), int(funct3)] = int(alu_control)
+    return table
+
+
+def control_model(op, func3, func7, alu_zero, alu_last_bit):
+    # Outputs of Control, as a dict of CONTROL_OUTPUTS arrays
+    main = _main_decoder_table()
+    outputs = {field: values[op] for field, values in main.items()}
+    Funct3, ShiftsF7, BranchFunct3 = rtl.Funct3, rtl.ShiftsF7, rtl.BranchFunct3
+
+    # Shift immediates are only written back with a valid funct7
+    sll_ok = func7 == int(ShiftsF7.sll_srl)
+    srl_sra_ok = sll_ok | (func7 == int(ShiftsF7.sra))
+    i_type_alu = op == int(rtl.Opcode.i_type_alu)
+    outputs["reg_write"] = np.where(
+        i_type_alu & (func3 == int(Funct3.sll)), sll_ok,
+        np.where(i_type_alu & (func3 == int(Funct3.srl_sra)), srl_sra_ok, outputs["reg_write"] != 0),
+    ).astype(np.uint32)
+
+    alu_op = outputs.pop("alu_op")
+    alu_control = _alu_decoder_table()[alu_op, func3]
+    math = alu_op == int(rtl.AluOp.math)
+    # add/sub is picked by funct7[5] for R-types only
+    sub = math & (func3 == int(Funct3.add_sub)) & (op == int(rtl.Opcode.r_type)) & (func7 >> 5 & 1 == 1)
+    alu_control = np.where(sub, np.uint32(rtl.AluControl.sub), alu_control)
+    srl_sra = math & (func3 == int(Funct3.srl_sra))
+    shift_right = np.select(
+        [func7 == int(ShiftsF7.sll_srl), func7 == int(ShiftsF7.sra)],
+        [np.uint32(rtl.AluControl.srl), np.uint32(rtl.AluControl.sra)],
+        np.uint32(rtl.AluControl.undefined),
+    )
+    outputs["alu_control"] = np.where(srl_sra, shift_right, alu_control).astype(np.uint32)
+
+    # The branch condition only looks at funct3, gated by the main decoder
+    branch = outputs.pop("branch") != 0
+    zero = alu_zero != 0
+    last_bit = alu_last_bit != 0
+    taken = np.select(
+        [func3 == int(BranchFunct3.beq), func3 == int(BranchFunct3.bne),
+         (func3 == int(BranchFunct3.blt)) | (func3 == int(BranchFunct3.bltu)),
+         (func3 == int(BranchFunct3.bge)) | (func3 == int(BranchFunct3.bgeu))],
+        [zero, ~zero, last_bit, ~last_bit],
+        False,
+    )
+    jump = outputs.pop("jump") != 0
+    outputs["pc_source"] = ((taken & branch) | jump).astype(np.uint32)
+    return outputs
@@ -0,0 +1,78 @@
+# BREAKPOINTS AND WATCHPOINTS
+#
+# Awaitables that wake Python only when something relevant may have
+# happened, instead of checking the Cpu on every clock edge:
+# - wait_for_pc: value changes of cpu.pc
+# - wait_for_store: value changes of dmem_byte_write_enable. While stores
+#   keep coming back to back the enable may not change, so the clock is
+#   followed until it drops again
+# - wait_for_reg_change: value changes of the regfile write enable
+#   (cpu.reg_write_port). Writes land on the rising edges while it is up,
+#   so the clock is followed until it drops, checking the address and data
+#   of each write
+#
+# Each one then applies a cheap filter and keeps waiting if it doesn't match.
+
+from cocotb.triggers import Edge, RisingEdge
+
+from utils import to_int
+
+
+async def wait_for_pc(cpu, pc):
+    # Returns once cpu.pc == pc, i.e. while the instruction at `pc` executes
+    signal = cpu.pc
+    while to_int(signal.value) != pc:
+        await Edge(signal)
+
+
+def _store_matches(address, dmem_addr, be):
+    # Does a store of byte enable `be` at word address `dmem_addr` touch `address`
+    return (dmem_addr & ~3) == (address & ~3) and (be >> (address & 3)) & 1
+
+
+async def wait_for_store(cpu, address):
+    # Returns (address, byte enable, write data) of the next store touching
+    # the byte at `address`, once the store is on the data memory port
+    clk = cpu.clk
+    be_signal = cpu.dmem_byte_write_enable
+    addr_signal = cpu.dmem_addr
+    data_signal = cpu.dmem_write_data
+
+    while True:
+        be = to_int(be_signal.value)
+        if not be:
+            await Edge(be_signal)
+            be = to_int(be_signal.value)
+        # Follow a run of stores one clock at a time
+        while be:
+            dmem_addr = to_int(addr_signal.value)
+            if _store_matches(address, dmem_addr, be):
+                return dmem_addr, be, to_int(data_signal.value)
+            await RisingEdge(clk)
+            be = to_int(be_signal.value)
+
+
+async def wait_for_reg_change(cpu, reg, value=None):
+    # Returns the new value of register `reg` the next time a write changes
+    # it, once the write is on the rising edge it lands on. `value` is the
+    # register's current value, read from the regfile if not given.
+    if not 1 <= reg < 32:
+        raise ValueError(f"x{reg} never changes")
+    if value is None:
+        value = to_int(cpu.regfile.mem.mem[reg].value)
+
+    clk = cpu.clk
+    port = cpu.reg_write_port
+    enable = port.write_enable
+
+    while True:
+        if not to_int(enable.value):
+            await Edge(enable)
+        # Values seen on a rising edge are the ones written on it
+        await RisingEdge(clk)
+        while to_int(enable.value):
+            if to_int(port.address.value) == reg:
+                data = to_int(port.data.value)
+                if data != value:
+                    return data
+            await RisingEdge(clk)